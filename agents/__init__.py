@@ -1,2 +1,4 @@
 from .property_agent import PropertyFindingAgent
 from .mapping_agent import LocationMappingAgent
+from .city_comparison import compare_cities
+from .model_router import ModelRouter
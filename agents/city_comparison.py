@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+from typing import List
+from models.schemas import CityComparison
+from .property_agent import PropertyFindingAgent
+from .mapping_agent import LocationMappingAgent
+from utils.price_utils import price_per_sqft
+
+def compare_city(
+    city: str,
+    property_agent: PropertyFindingAgent,
+    mapping_agent: LocationMappingAgent,
+    max_price: float,
+    min_price: float = 0.0,
+    property_category: str = "Residential",
+    max_pages: int = 5,
+    geocode: bool = False
+) -> CityComparison:
+    """Run the search and trends pipeline for a single city
+    
+    Set ``geocode`` to also map the listings. Nominatim allows one request
+    per second for all workers together, so geocoding makes run time grow
+    with the total number of listings rather than the pool size.
+    """
+    try:
+        batches = property_agent.crawl_properties(
+            city=city,
+            min_price=min_price,
+            max_price=max_price,
+            property_category=property_category,
+            max_pages=max_pages
+        )
+        
+        rates = []
+        listings = []
+        property_locations = []
+        
+        def tally(batches):
+            for batch in batches:
+                listings.append(len(batch))
+                for prop in batch:
+                    rate = price_per_sqft(prop.price, prop.area_sqft)
+                    if rate is not None:
+                        rates.append(rate)
+                yield batch
+        
+        if geocode:
+            for _, locations in mapping_agent.process_property_batches(tally(batches), city):
+                property_locations.extend(locations)
+        else:
+            for _ in tally(batches):
+                pass
+        
+        locations = property_agent.get_location_trends_data(city)
+        appreciations = [location.percent_increase for location in locations]
+        
+        return CityComparison(
+            city=city,
+            listing_count=sum(listings),
+            median_price_per_sqft=median(rates) if rates else None,
+            median_appreciation=median(appreciations) if appreciations else None,
+            locality_count=len(locations),
+            mapped_count=sum(1 for loc in property_locations if loc.latitude != 0.0 or loc.longitude != 0.0) if geocode else None,
+            property_locations=property_locations
+        )
+    except Exception as e:
+        print(f"City comparison error for {city}: {e}")
+        return CityComparison(city=city, error=str(e))
+
+def compare_cities(
+    cities: List[str],
+    property_agent: PropertyFindingAgent,
+    mapping_agent: LocationMappingAgent,
+    max_price: float,
+    min_price: float = 0.0,
+    property_category: str = "Residential",
+    max_workers: int = 4,
+    max_pages: int = 5,
+    geocode: bool = False
+) -> List[CityComparison]:
+    """Compare plot markets across cities using a bounded worker pool
+    
+    Cities are processed concurrently by at most ``max_workers`` threads.
+    The agents are shared between workers, so their rate limiters cap the
+    total request rate to Firecrawl and Nominatim across all cities. The
+    table needs no coordinates, so listings are only geocoded when
+    ``geocode`` is set. Results are returned in the order the cities were
+    given.
+    """
+    # Drop blanks and duplicates, ignoring case, while keeping the user's order and spelling
+    unique = {}
+    for city in cities:
+        unique.setdefault(city.strip().lower(), city.strip())
+    cities = [city for key, city in unique.items() if key]
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(
+            lambda city: compare_city(
+                city,
+                property_agent,
+                mapping_agent,
+                max_price=max_price,
+                min_price=min_price,
+                property_category=property_category,
+                max_pages=max_pages,
+                geocode=geocode
+            ),
+            cities
+        ))
@@ -1,25 +1,41 @@
-from typing import List, Tuple
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Tuple
 import requests
 import json
-import time
-from models.schemas import PropertyLocation
+from models.schemas import PropertyData, PropertyLocation
+from utils.rate_limit import RateLimiter
+from utils.background import iterate_in_background
+from utils.price_utils import price_per_sqft
+from utils.similarity_index import listing_key
+from .model_router import ModelRouter
 
 class LocationMappingAgent:
     """Agent responsible for geocoding property addresses and preparing map data"""
     
-    def __init__(self, openai_api_key: str, model_id: str = "o3-mini"):
-        self.agent = Agent(
-            model=OpenAIChat(id=model_id, api_key=openai_api_key),
-            markdown=True,
-            description="I am a geolocation expert who converts addresses to coordinates and prepares map data."
-        )
+    def __init__(
+        self,
+        openai_api_key: str,
+        model_id: str = "o3-mini",
+        rate_limiter: Optional[RateLimiter] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        self.description = "I am a geolocation expert who converts addresses to coordinates and prepares map data."
+        # Without a router every stage uses the selected model
+        self.router = router or ModelRouter(openai_api_key, default_model=model_id)
         # Using Nominatim geocoding service
         self.geocoding_url = "https://nominatim.openstreetmap.org/search"
+        # Nominatim allows one request per second across all callers
+        self.rate_limiter = rate_limiter or RateLimiter(requests_per_second=1.0)
+        # Listings in the same locality share addresses, so cache lookups
+        self._geocode_cache: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        self._city_centres: Dict[str, Tuple[float, float]] = {}
     
-    def geocode_address(self, address: str, city: str) -> Tuple[float, float]:
-        """Convert address to latitude and longitude using Nominatim"""
+    def _lookup_address(self, address: str, city: str, city_fallback: bool = True) -> Tuple[float, float]:
+        """Geocode with Nominatim, raising if a request fails
+        
+        Returns the city centre when the address is unknown, and (0.0, 0.0)
+        when neither is found. Without ``city_fallback`` an unknown address
+        returns (0.0, 0.0), so it is never mistaken for a real position.
+        """
         full_address = f"{address}, {city}"
         
         params = {
@@ -32,23 +48,45 @@ class LocationMappingAgent:
             'User-Agent': 'PlotTrends/1.0'
         }
         
+        self.rate_limiter.wait()
+        response = requests.get(self.geocoding_url, params=params, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        
+        if data and len(data) > 0:
+            return float(data[0]['lat']), float(data[0]['lon'])
+        
+        if not city_fallback:
+            return 0.0, 0.0
+        
+        # Fall back to city coordinates if specific address not found
+        return self._city_centre(city, headers)
+    
+    def _city_centre(self, city: str, headers: dict) -> Tuple[float, float]:
+        """Coordinates of the city, looked up once per city"""
+        key = city.strip().lower()
+        if key in self._city_centres:
+            return self._city_centres[key]
+        
+        city_params = {'q': city, 'format': 'json', 'limit': 1}
+        self.rate_limiter.wait()
+        city_response = requests.get(self.geocoding_url, params=city_params, headers=headers)
+        city_response.raise_for_status()
+        city_data = city_response.json()
+        
+        if city_data and len(city_data) > 0:
+            centre = float(city_data[0]['lat']), float(city_data[0]['lon'])
+        else:
+            # Default coordinates if geocoding fails completely
+            centre = 0.0, 0.0
+        
+        self._city_centres[key] = centre
+        return centre
+    
+    def geocode_address(self, address: str, city: str) -> Tuple[float, float]:
+        """Convert address to latitude and longitude using Nominatim"""
         try:
-            response = requests.get(self.geocoding_url, params=params, headers=headers)
-            data = response.json()
-            
-            if data and len(data) > 0:
-                return float(data[0]['lat']), float(data[0]['lon'])
-            else:
-                # Fall back to city coordinates if specific address not found
-                city_params = {'q': city, 'format': 'json', 'limit': 1}
-                city_response = requests.get(self.geocoding_url, params=city_params, headers=headers)
-                city_data = city_response.json()
-                
-                if city_data and len(city_data) > 0:
-                    return float(city_data[0]['lat']), float(city_data[0]['lon'])
-                
-                # Default coordinates if geocoding fails completely
-                return 0.0, 0.0
+            return self._lookup_address(address, city)
         except Exception as e:
             print(f"Geocoding error: {e}")
             return 0.0, 0.0
@@ -63,10 +101,6 @@ class LocationMappingAgent:
             price = prop.get('price', 'Price not available')
             url = prop.get('url', '')
             
-            # Allow time for API rate limiting
-            if idx > 0:
-                time.sleep(1)  # Be respectful to the geocoding API
-            
             lat, lon = self.geocode_address(address, city)
             
             property_locations.append(
@@ -77,7 +111,72 @@ class LocationMappingAgent:
                     latitude=lat,
                     longitude=lon,
                     price=price,
-                    url=url
+                    url=url,
+                    price_per_sqft=price_per_sqft(price, prop.get('area_sqft'))
+                )
+            )
+        
+        return property_locations
+    
+    def geocode_address_cached(self, address: str, city: str) -> Tuple[float, float]:
+        """Geocode an address, reusing earlier results for repeated addresses
+        
+        An address that is not found returns (0.0, 0.0) rather than the city
+        centre, so ranking and price aggregation treat it as unknown. Failed
+        requests are not cached, so the address is retried next time.
+        """
+        key = (address.strip().lower(), city.strip().lower())
+        if key not in self._geocode_cache:
+            try:
+                self._geocode_cache[key] = self._lookup_address(address, city, city_fallback=False)
+            except Exception as e:
+                print(f"Geocoding error: {e}")
+                return 0.0, 0.0
+        return self._geocode_cache[key]
+    
+    def process_property_batches(
+        self, batches: Iterable[List[PropertyData]], city: str, prefetch: int = 2
+    ) -> Iterator[Tuple[List[PropertyData], List[PropertyLocation]]]:
+        """Geocode batches of crawled properties as they arrive
+        
+        The batches are pulled in a background thread, up to ``prefetch``
+        ahead, so the crawl keeps going while a batch is being geocoded.
+        Yields each batch with its locations as soon as it is geocoded, so
+        the caller can update the map while the crawl is still running.
+        """
+        idx = 0
+        
+        for batch in iterate_in_background(batches, max_buffered=prefetch):
+            coordinates = [self.geocode_address_cached(prop.location_address, city) for prop in batch]
+            yield batch, self.locate_properties(batch, coordinates, start_idx=idx)
+            idx += len(batch)
+    
+    def locate_properties(
+        self,
+        properties: List[PropertyData],
+        coordinates: List[Tuple[float, float]],
+        start_idx: int = 0,
+        recommended: Collection[str] = ()
+    ) -> List[PropertyLocation]:
+        """Build map locations for properties whose coordinates are already known
+        
+        Properties whose listing key is in ``recommended`` are marked so the
+        map can highlight them.
+        """
+        property_locations = []
+        
+        for idx, (prop, (lat, lon)) in enumerate(zip(properties, coordinates), start=start_idx):
+            property_locations.append(
+                PropertyLocation(
+                    property_id=f"prop_{idx}",
+                    property_name=prop.building_name or f"Plot {idx+1}",
+                    address=prop.location_address,
+                    latitude=lat,
+                    longitude=lon,
+                    price=prop.price,
+                    url=prop.url,
+                    price_per_sqft=price_per_sqft(prop.price, prop.area_sqft),
+                    recommended=listing_key(prop) in recommended
                 )
             )
         
@@ -91,7 +190,8 @@ class LocationMappingAgent:
         # Convert to JSON for the agent
         locations_json = json.dumps([loc.dict() for loc in property_locations])
         
-        analysis = self.agent.run(
+        analysis = self.router.run(
+            "area_insights",
             f"""As a geolocation and real estate expert, analyze the geographic distribution of these plots in {city}:
 
             {locations_json}
@@ -114,7 +214,8 @@ class LocationMappingAgent:
                - Suggest which areas show highest development potential
                
             Format your response in a clear, structured way using bullet points and sections.
-            """
+            """,
+            description=self.description
         )
         
-        return analysis.content
+        return analysis
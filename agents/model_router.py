@@ -0,0 +1,237 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from agno.agent import Agent
+from agno.models.openai import OpenAIChat
+
+# Fast model used for light stages and as the fallback when a deadline is close
+FAST_MODEL = "gpt-4o-mini"
+
+# Consecutive errors after which a model is rested for a cooldown
+MAX_CONSECUTIVE_ERRORS = 2
+
+# During a timeout cooldown a model is only retried with this much more time
+TIMEOUT_MARGIN = 1.5
+
+def default_stage_models(model_id: str) -> Dict[str, List[str]]:
+    """Model chains per stage built around the selected model
+
+    Heavy stages use the selected model and fall back to the fast model,
+    light stages go straight to the fast model.
+    """
+    chain = [model_id] if model_id == FAST_MODEL else [model_id, FAST_MODEL]
+    return {
+        "investment_analysis": chain,
+        "trends_analysis": chain,
+        "area_insights": [FAST_MODEL],
+    }
+
+class ModelRouter:
+    """Route agent calls to a model per stage under a per-call deadline
+
+    Each stage has a chain of models ordered from strongest to fastest. A
+    model is skipped when it is not expected to finish in the remaining
+    time, and a call that runs too long or fails falls through to the next
+    model in the chain. Latencies of successful calls are tracked as an
+    exponential moving average per (model, stage) so routing adapts as the
+    app runs.
+
+    Timeouts are counted separately. The budget a call exceeded is kept as
+    a lower bound on that model's latency, and routing skips the model
+    while it cannot fit that bound for a cooldown that doubles with each
+    consecutive timeout. A model that errors repeatedly is rested from
+    every chain for a cooldown that doubles in the same way. After a
+    cooldown the model is tried again, and one success clears its record.
+
+    Each call gets a fresh agent on its own thread. A call that times out
+    cannot be cancelled, so it finishes in the background and its result
+    is discarded, without holding up later calls.
+    """
+
+    def __init__(
+        self,
+        openai_api_key: str,
+        default_model: str = "o3-mini",
+        stage_models: Optional[Dict[str, List[str]]] = None,
+        deadline_seconds: Optional[float] = None,
+        fallback_reserve: float = 0.3,
+        smoothing: float = 0.3,
+        cooldown_seconds: float = 30.0,
+        max_cooldown_seconds: float = 600.0
+    ):
+        self.openai_api_key = openai_api_key
+        self.default_model = default_model
+        self.stage_models = stage_models or {}
+        self.deadline_seconds = deadline_seconds
+        # Minimum share of the remaining time kept for the last model in a chain
+        self.fallback_reserve = fallback_reserve
+        self.smoothing = smoothing
+        # First cooldown after timeouts or repeated errors, doubling up to the maximum
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self._latency: Dict[Tuple[str, str], float] = {}
+        self._latency_bounds: Dict[Tuple[str, str], float] = {}
+        self._calls: Dict[Tuple[str, str], int] = {}
+        self._timeouts: Dict[Tuple[str, str], int] = {}
+        self._failures: Dict[Tuple[str, str], int] = {}
+        self._consecutive_timeouts: Dict[Tuple[str, str], int] = {}
+        self._bound_until: Dict[Tuple[str, str], float] = {}
+        self._consecutive_errors: Dict[str, int] = {}
+        self._resting_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _cooldown(self, consecutive: int) -> float:
+        return min(self.cooldown_seconds * 2 ** (consecutive - 1), self.max_cooldown_seconds)
+
+    def models_for(self, stage: str) -> List[str]:
+        """Model chain for a stage without resting models, or the default model"""
+        chain = self.stage_models.get(stage) or [self.default_model]
+        now = time.monotonic()
+        with self._lock:
+            usable = [model_id for model_id in chain if self._resting_until.get(model_id, 0.0) <= now]
+        return usable or [self.default_model]
+
+    def expected_latency(self, model_id: str, stage: str) -> Optional[float]:
+        """Latency routing should expect for the model on this stage, if known"""
+        key = (model_id, stage)
+        with self._lock:
+            estimates = [self._latency.get(key)]
+            # A timeout only counts against the model until its cooldown ends
+            if self._bound_until.get(key, 0.0) > time.monotonic():
+                estimates.append(self._latency_bounds[key] * TIMEOUT_MARGIN)
+        estimates = [value for value in estimates if value is not None]
+        return max(estimates) if estimates else None
+
+    def record_latency(self, model_id: str, stage: str, seconds: float):
+        """Fold the latency of a successful call into the moving average"""
+        key = (model_id, stage)
+        with self._lock:
+            previous = self._latency.get(key)
+            if previous is None:
+                self._latency[key] = seconds
+            else:
+                self._latency[key] = self.smoothing * seconds + (1 - self.smoothing) * previous
+            self._calls[key] = self._calls.get(key, 0) + 1
+            for state in (self._latency_bounds, self._bound_until, self._consecutive_timeouts):
+                state.pop(key, None)
+            self._consecutive_errors.pop(model_id, None)
+            self._resting_until.pop(model_id, None)
+
+    def record_timeout(self, model_id: str, stage: str, budget: float):
+        """Count a timeout and skip the model for budgets up to ``budget`` for a while"""
+        key = (model_id, stage)
+        with self._lock:
+            self._timeouts[key] = self._timeouts.get(key, 0) + 1
+            consecutive = self._consecutive_timeouts.get(key, 0) + 1
+            self._consecutive_timeouts[key] = consecutive
+            self._latency_bounds[key] = max(budget, self._latency_bounds.get(key, 0.0))
+            self._bound_until[key] = time.monotonic() + self._cooldown(consecutive)
+
+    def record_failure(self, model_id: str, stage: str):
+        """Count an error; models that keep failing are rested for a while"""
+        with self._lock:
+            self._failures[(model_id, stage)] = self._failures.get((model_id, stage), 0) + 1
+            consecutive = self._consecutive_errors.get(model_id, 0) + 1
+            self._consecutive_errors[model_id] = consecutive
+            if consecutive >= MAX_CONSECUTIVE_ERRORS:
+                cooldown = self._cooldown(consecutive - MAX_CONSECUTIVE_ERRORS + 1)
+                self._resting_until[model_id] = time.monotonic() + cooldown
+
+    def latency_stats(self) -> List[dict]:
+        """Observed latency and outcomes per model and stage, for display"""
+        with self._lock:
+            keys = set(self._latency) | set(self._timeouts) | set(self._failures)
+            return [
+                {
+                    "stage": stage,
+                    "model": model_id,
+                    "avg_latency_s": round(self._latency[(model_id, stage)], 2) if (model_id, stage) in self._latency else None,
+                    "calls": self._calls.get((model_id, stage), 0),
+                    "timeouts": self._timeouts.get((model_id, stage), 0),
+                    "failures": self._failures.get((model_id, stage), 0)
+                }
+                for model_id, stage in sorted(keys, key=lambda key: key[::-1])
+            ]
+
+    def _new_agent(self, model_id: str, description: str) -> Agent:
+        # Agents keep per-run state, so never share one between calls
+        return Agent(
+            model=OpenAIChat(id=model_id, api_key=self.openai_api_key),
+            markdown=True,
+            description=description
+        )
+
+    def _run_with_timeout(self, model_id: str, prompt: str, description: str, timeout: float):
+        """Run the prompt on a fresh agent, raising TimeoutError after ``timeout``"""
+        outcome = {}
+        done = threading.Event()
+
+        def call():
+            try:
+                outcome['response'] = self._new_agent(model_id, description).run(prompt)
+            except Exception as e:
+                outcome['error'] = e
+            finally:
+                done.set()
+
+        threading.Thread(target=call, daemon=True).start()
+        if not done.wait(timeout):
+            raise TimeoutError(f"{model_id} exceeded {timeout:.1f}s")
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['response']
+
+    def _time_budget(self, models: List[str], idx: int, stage: str, remaining: float) -> float:
+        """Time the model at ``idx`` may use while leaving room for the fallback"""
+        if idx == len(models) - 1:
+            return remaining
+
+        # Keep at least the reserve share so a noisy fallback still fits
+        fallback_latency = self.expected_latency(models[-1], stage) or 0.0
+        return remaining - max(fallback_latency, remaining * self.fallback_reserve)
+
+    def run(self, stage: str, prompt: str, description: str, deadline_seconds: Optional[float] = None) -> str:
+        """Run the prompt on the best model that can answer within the deadline"""
+        deadline = deadline_seconds if deadline_seconds is not None else self.deadline_seconds
+        models = self.models_for(stage)
+        start = time.monotonic()
+        last_error = None
+
+        for idx, model_id in enumerate(models):
+            if deadline is None:
+                # No deadline: try the chain in order, only falling back on errors
+                budget = None
+            else:
+                remaining = deadline - (time.monotonic() - start)
+                if remaining <= 0:
+                    break
+
+                budget = self._time_budget(models, idx, stage, remaining)
+                expected = self.expected_latency(model_id, stage)
+                if idx < len(models) - 1 and (budget <= 0 or (expected is not None and expected >= budget)):
+                    print(f"Skipping {model_id} for {stage}: deadline too close")
+                    continue
+
+            call_start = time.monotonic()
+            try:
+                if budget is None:
+                    response = self._new_agent(model_id, description).run(prompt)
+                else:
+                    response = self._run_with_timeout(model_id, prompt, description, budget)
+            except TimeoutError as e:
+                self.record_timeout(model_id, stage, budget)
+                last_error = e
+                print(f"Model {model_id} timed out for {stage}, falling back")
+                continue
+            except Exception as e:
+                self.record_failure(model_id, stage)
+                last_error = e
+                print(f"Model {model_id} failed for {stage}: {e}")
+                continue
+
+            self.record_latency(model_id, stage, time.monotonic() - call_start)
+            return response.content
+
+        if deadline is None:
+            raise last_error
+        raise TimeoutError(f"No model completed '{stage}' within {deadline}s") from last_error
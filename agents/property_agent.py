@@ -1,19 +1,34 @@
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from firecrawl import FirecrawlApp
-from models.schemas import PropertiesResponse, LocationsResponse
+from pydantic import ValidationError
+from models.schemas import CrawlStatus, PropertyData, PropertiesResponse, LocationData, LocationsResponse, RankingWeights
+from utils.rate_limit import RateLimiter
+from utils.ranking import rank_properties
+from utils.similarity_index import listing_key
+from .model_router import ModelRouter
 
 class PropertyFindingAgent:
     """Agent responsible for finding properties and providing recommendations"""
     
-    def __init__(self, firecrawl_api_key: str, openai_api_key: str, model_id: str = "o3-mini"):
-        self.agent = Agent(
-            model=OpenAIChat(id=model_id, api_key=openai_api_key),
-            markdown=True,
-            description="I am a real estate expert who helps find and analyze properties based on user preferences."
-        )
+    def __init__(
+        self,
+        firecrawl_api_key: str,
+        openai_api_key: str,
+        model_id: str = "o3-mini",
+        rate_limiter: Optional[RateLimiter] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        self.description = "I am a real estate expert who helps find and analyze properties based on user preferences."
+        # Without a router every stage uses the selected model
+        self.router = router or ModelRouter(openai_api_key, default_model=model_id)
         self.firecrawl = FirecrawlApp(api_key=firecrawl_api_key)
         self.last_response = None  # Store the last response
+        self.last_candidates: List[PropertyData] = []  # Validated listings of the last search
+        self.last_ranked: List[PropertyData] = []  # Top plots sent for analysis, best first
+        self.last_coordinates: Dict[str, Tuple[float, float]] = {}  # Candidate positions by listing key
+        # Shared by all callers of this agent, e.g. multi-city worker threads
+        self.rate_limiter = rate_limiter or RateLimiter(requests_per_second=2.0)
 
     def find_properties(
         self, 
@@ -21,9 +36,22 @@ class PropertyFindingAgent:
         max_price: float,
         min_price: float = 0.0,  # Added min_price parameter with default value
         property_category: str = "Residential",
-        property_type: str = "Plot"
+        property_type: str = "Plot",
+        top_k: int = 5,
+        max_candidates: int = 30,
+        weights: Optional[RankingWeights] = None,
+        geocode: Optional[Callable[[str, str], Tuple[float, float]]] = None,
+        locality_medians: Optional[Dict[str, float]] = None
     ) -> str:
-        """Find and analyze properties based on user preferences"""
+        """Find and analyze properties based on user preferences
+        
+        Up to ``max_candidates`` plots are extracted and ranked locally with
+        ``rank_properties``; only the ``top_k`` best are sent to the model
+        for the write-up. Pass ``geocode`` (address, city) -> (lat, lon) to
+        rank on location as well, and ``locality_medians`` (price per sq ft
+        by locality) to compare prices with market trends. The coordinates
+        are kept in ``last_coordinates`` for mapping.
+        """
         formatted_location = city.lower()
         
         urls = [
@@ -34,10 +62,11 @@ class PropertyFindingAgent:
         ]
         
         # Updated prompt to include both min and max price filters
+        self.rate_limiter.wait()
         raw_response = self.firecrawl.extract(
             urls=urls,
             params={
-                'prompt': f"""Extract ONLY 10 OR LESS different {property_category} Plots from {city} that cost between {min_price} and {max_price} crores.
+                'prompt': f"""Extract ONLY {max_candidates} OR LESS different {property_category} Plots from {city} that cost between {min_price} and {max_price} crores.
                 
                 Requirements:
                 - Property Category: {property_category} plots only
@@ -53,7 +82,7 @@ class PropertyFindingAgent:
                   - Connectivity details
                   - Nearby landmarks and facilities
                 - IMPORTANT: Include the original property URL for each listing
-                - Return data for at least 5 different plots. MAXIMUM 10.
+                - Return data for at least {top_k} different plots. MAXIMUM {max_candidates}.
                 - Format as a list of plots with their respective details
                 """,
                 'schema': PropertiesResponse.model_json_schema()
@@ -71,24 +100,53 @@ class PropertyFindingAgent:
             properties = []
             
         print("Processed Properties:", properties)
-
         
-        # Update the agent prompt to include min_price
-        analysis = self.agent.run(
+        candidates = []
+        for prop in properties:
+            try:
+                candidates.append(PropertyData.model_validate(prop))
+            except ValidationError:
+                continue
+        
+        coordinates = None
+        if geocode is not None:
+            coordinates = [geocode(prop.location_address, city) for prop in candidates]
+        
+        ranked = rank_properties(
+            candidates,
+            top_k=top_k,
+            weights=weights,
+            min_price=min_price,
+            max_price=max_price,
+            locality_medians=locality_medians,
+            coordinates=coordinates
+        )
+        self.last_candidates = candidates
+        self.last_coordinates = {
+            listing_key(prop): coords for prop, coords in zip(candidates, coordinates or [])
+        }
+        self.last_ranked = ranked
+        top_properties = [prop.model_dump() for prop in ranked]
+        
+        print(f"Ranked {len(candidates)} candidates, sending top {len(top_properties)} for analysis")
+        
+        analysis = self.router.run(
+            "investment_analysis",
             f"""As a real estate expert, analyze these plots and market trends:
 
             Properties Found in json format:
-            {properties}
+            {top_properties}
 
             **IMPORTANT INSTRUCTIONS:**
-            1. ONLY analyze plots from the above JSON data that match the user's requirements:
+            1. These plots already match the user's requirements:
                - Property Category: {property_category}
                - Price Range: Between {min_price} and {max_price} crores
-            2. From the matching plots, select the 5 best plots
+            2. They are ranked best first by price per sq ft against the locality, plot area,
+               construction approval and location. Keep this order and do not drop any plot.
 
             Please provide your analysis in this format:
             
-            First, create a wrapper div with class="card-container" and inside it, create 5 HTML divs (one for each plot) with class="property-card" using this structure:
+            First, create a wrapper div with class="card-container" and inside it, create {len(top_properties)} HTML divs (one for each plot) with class="property-card" using this structure:
             
             <div class="card-container">
               <div class="property-card">
@@ -102,7 +160,7 @@ class PropertyFindingAgent:
                 <div class="property-description">BRIEF_DESCRIPTION (up to 100 words)</div>
                 <a href="PROPERTY_URL" class="property-cta" target="_blank">View Details</a>
               </div>
-              <!-- Repeat for all 5 properties -->
+              <!-- Repeat for all {len(top_properties)} properties -->
             </div>
             
             DO NOT wrap this HTML in triple backticks or markdown code blocks.
@@ -114,7 +172,7 @@ class PropertyFindingAgent:
             Your analysis should include:
 
             💰 PLOT VALUE ANALYSIS
-            • Compare the selected plots based on:
+            • Compare the ranked plots based on:
               - Price per sq ft
               - Location advantage
               - Development potential
@@ -138,13 +196,155 @@ class PropertyFindingAgent:
             • Legal considerations specific to land purchases
 
             Remember: First provide the HTML card container with all cards inside (without code blocks), then the text analysis AFTER the marker.
-            """
+            """,
+            description=self.description
         )
         
-        return analysis.content
+        return analysis
+
+    def _listing_page_urls(self, city: str, page: int) -> List[str]:
+        """Build the result page URLs of each portal for the given page number"""
+        formatted_location = city.lower()
+        
+        return [
+            f"https://www.squareyards.com/sale/plot-for-sale-in-{formatted_location}?page={page}",
+            f"https://www.99acres.com/plots-in-{formatted_location}-ffid-page-{page}",
+            f"https://housing.com/in/buy/plots/{formatted_location}/{formatted_location}?page={page}",
+            f"https://www.magicbricks.com/property-for-sale-rent-in-{formatted_location}/Plots-Land-{formatted_location}?page={page}",
+        ]
 
-    def get_location_trends(self, city: str) -> str:
-        """Get price trends for different localities in the city"""
+    def _extract_listing_page(
+        self,
+        city: str,
+        page: int,
+        max_price: float,
+        min_price: float,
+        property_category: str,
+        max_retries: int
+    ) -> Optional[list]:
+        """Extract the listings of one result page, retrying failed requests
+        
+        Returns None if every attempt failed, so callers can tell a failed
+        page apart from a page with no listings.
+        """
+        for attempt in range(max_retries + 1):
+            if attempt:
+                time.sleep(2 ** attempt)  # Back off before retrying a throttled page
+            
+            self.rate_limiter.wait()
+            try:
+                raw_response = self.firecrawl.extract(
+                    urls=self._listing_page_urls(city, page),
+                    params={
+                        'prompt': f"""Extract ALL {property_category} Plots listed on these result pages from {city} that cost between {min_price} and {max_price} crores.
+                        
+                        Requirements:
+                        - Property Category: {property_category} plots only
+                        - Property Type: Plot/Land only
+                        - Location: {city}
+                        - Price Range: Between {min_price} and {max_price} crores
+                        - Extract every listing on the page, do not summarise or skip any
+                        - Include plot area in square feet, dimensions and legal approval status where available
+                        - IMPORTANT: Include the original property URL for each listing
+                        - Format as a list of plots with their respective details
+                        """,
+                        'schema': PropertiesResponse.model_json_schema()
+                    }
+                )
+            except Exception as e:
+                print(f"Extraction error on page {page} for {city} (attempt {attempt + 1}): {e}")
+                continue
+            
+            if isinstance(raw_response, dict) and raw_response.get('success'):
+                return raw_response['data'].get('properties', [])
+            print(f"Extraction failed on page {page} for {city} (attempt {attempt + 1})")
+        
+        return None
+
+    def crawl_properties(
+        self,
+        city: str,
+        max_price: float,
+        min_price: float = 0.0,
+        property_category: str = "Residential",
+        batch_size: int = 200,
+        max_pages: int = 500,
+        max_retries: int = 2,
+        max_empty_pages: int = 2,
+        max_failed_pages: int = 3,
+        status: Optional[CrawlStatus] = None
+    ) -> Iterator[List[PropertyData]]:
+        """Crawl every result page of the portals and yield listings in batches
+        
+        Pages are extracted one at a time and at most ``batch_size`` listings
+        are held before being handed to the caller, so memory stays bounded no
+        matter how many listings a city has. Failed pages are retried, and the
+        crawl ends after ``max_empty_pages`` consecutive pages that succeed
+        without new listings. It gives up after ``max_failed_pages``
+        consecutive failed pages or at ``max_pages``.
+        
+        Pass a ``CrawlStatus`` to learn whether the crawl finished or was cut
+        short, and which pages failed. Raw payloads are discarded after
+        parsing and never stored in ``last_response``.
+        """
+        status = status if status is not None else CrawlStatus()
+        seen_keys = set()
+        batch = []
+        empty_pages = 0
+        failed_in_a_row = 0
+        
+        for page in range(1, max_pages + 1):
+            page_properties = self._extract_listing_page(
+                city, page, max_price, min_price, property_category, max_retries
+            )
+            status.pages_crawled = page
+            
+            if page_properties is None:
+                status.failed_pages.append(page)
+                failed_in_a_row += 1
+                if failed_in_a_row >= max_failed_pages:
+                    status.stop_reason = f"{failed_in_a_row} pages in a row failed"
+                    break
+                continue
+            failed_in_a_row = 0
+            
+            new_on_page = 0
+            for prop in page_properties:
+                try:
+                    record = PropertyData.model_validate(prop)
+                except ValidationError:
+                    continue
+                
+                # Portals repeat featured listings across pages
+                key = listing_key(record)
+                if key in seen_keys:
+                    continue
+                seen_keys.add(key)
+                new_on_page += 1
+                status.listings += 1
+                
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            del page_properties
+            
+            print(f"Crawled page {page} for {city}: {new_on_page} new listings")
+            
+            empty_pages = empty_pages + 1 if new_on_page == 0 else 0
+            if empty_pages >= max_empty_pages:
+                status.complete = not status.failed_pages
+                status.stop_reason = "no more listings"
+                break
+        else:
+            status.stop_reason = f"reached the {max_pages} page limit"
+        
+        if batch:
+            yield batch
+
+    def get_location_trends_data(self, city: str) -> List[LocationData]:
+        """Extract structured plot price trends for localities in the city"""
+        self.rate_limiter.wait()
         raw_response = self.firecrawl.extract([
             f"https://www.99acres.com/property-rates-and-price-trends-in-{city.lower()}-prffid/*",
             f"https://housing.com/in/buy/plots/{city.lower()}/{city.lower()}"
@@ -166,10 +366,32 @@ class PropertyFindingAgent:
             'schema': LocationsResponse.model_json_schema(),
         })
         
-        if isinstance(raw_response, dict) and raw_response.get('success'):
-            locations = raw_response['data'].get('locations', [])
+        if not (isinstance(raw_response, dict) and raw_response.get('success')):
+            return []
+        
+        locations = []
+        for location in raw_response['data'].get('locations', []):
+            try:
+                locations.append(LocationData.model_validate(location))
+            except ValidationError:
+                continue
+        
+        return locations
+
+    def get_location_trends(self, city: str, locations: Optional[List[LocationData]] = None) -> str:
+        """Get price trends for different localities in the city
+        
+        Pass ``locations`` from ``get_location_trends_data`` to reuse trends
+        that were already extracted.
+        """
+        if locations is None:
+            locations = self.get_location_trends_data(city)
+        
+        if locations:
+            locations = [location.model_dump() for location in locations]
     
-            analysis = self.agent.run(
+            analysis = self.router.run(
+                "trends_analysis",
                 f"""As a real estate expert specializing in plot investments, analyze these location price trends for {city}:
 
                 {locations}
@@ -210,9 +432,10 @@ class PropertyFindingAgent:
 
                 🎯 RECOMMENDATIONS FOR PLOT BUYERS
                 • [Specific advice for plot purchase decisions]
-                """
+                """,
+                description=self.description
             )
             
-            return analysis.content
+            return analysis
             
         return "No price trends data available for plots in this area"
@@ -2,12 +2,14 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from streamlit_folium import folium_static
+import time
 import traceback
 
 # Import from local modules
-from models import PropertyLocation
-from agents import PropertyFindingAgent, LocationMappingAgent
-from utils import create_map_with_properties
+from models import CrawlStatus, PropertyLocation, RankingWeights
+from agents import PropertyFindingAgent, LocationMappingAgent, ModelRouter, compare_cities
+from agents.model_router import default_stage_models
+from utils import create_map_with_properties, precompute_price_grids, PlotSimilarityIndex, listing_key
 from ui import apply_styles
 
 # Load environment variables from .env file
@@ -15,18 +17,185 @@ load_dotenv()
 
 def create_agents():
     """Create the agent pipeline from environment variables"""
+    # Rebuild the pipeline when the model settings change
+    agent_config = (st.session_state.model_id, st.session_state.per_stage_routing, st.session_state.deadline_seconds)
+    if st.session_state.get('agent_config') != agent_config:
+        for key in ('model_router', 'property_agent', 'mapping_agent'):
+            st.session_state.pop(key, None)
+        st.session_state.agent_config = agent_config
+    
+    if 'model_router' not in st.session_state:
+        st.session_state.model_router = ModelRouter(
+            openai_api_key=os.getenv('OPENAI_API_KEY'),
+            default_model=st.session_state.model_id,
+            stage_models=default_stage_models(st.session_state.model_id) if st.session_state.per_stage_routing else None,
+            deadline_seconds=st.session_state.deadline_seconds
+        )
+    
     if 'property_agent' not in st.session_state:
         st.session_state.property_agent = PropertyFindingAgent(
             firecrawl_api_key=os.getenv('FIRECRAWL_API_KEY'),
             openai_api_key=os.getenv('OPENAI_API_KEY'),
-            model_id=st.session_state.model_id
+            model_id=st.session_state.model_id,
+            router=st.session_state.model_router
         )
     
     if 'mapping_agent' not in st.session_state:
         st.session_state.mapping_agent = LocationMappingAgent(
             openai_api_key=os.getenv('OPENAI_API_KEY'),
-            model_id=st.session_state.model_id
+            model_id=st.session_state.model_id,
+            router=st.session_state.model_router
+        )
+
+def price_grids_for(property_locations):
+    """Price-per-sq-ft grids for the map when the heatmap is enabled"""
+    if not st.session_state.show_price_heatmap:
+        return None
+    return precompute_price_grids(property_locations)
+
+def show_similar_plots(prop, k=5):
+    """List stored plots similar to one plot, without any network call"""
+    neighbours = st.session_state.plot_index.neighbours(listing_key(prop), k=k)
+    if not neighbours:
+        st.caption("No similar plots stored yet")
+        return
+    
+    for similar, _ in neighbours:
+        name = f"[{similar.building_name}]({similar.url})" if similar.url else similar.building_name
+        area = f"{similar.area_sqft:,.0f} sq.ft" if similar.area_sqft else "Area not available"
+        st.markdown(f"- **{name}** · {similar.price} · {area} · {similar.location_address}")
+
+def show_property_cards(html_cards, properties, per_row=3):
+    """Render the generated plot cards, each with its similar plots underneath"""
+    # The model writes one property-card div per plot, best first
+    cards = html_cards.split('<div class="property-card">')[1:]
+    if not cards:
+        st.markdown(html_cards, unsafe_allow_html=True)
+        return
+    
+    for row_start in range(0, len(cards), per_row):
+        columns = st.columns(per_row)
+        for position, card in enumerate(cards[row_start:row_start + per_row], start=row_start):
+            # Match the card to its plot by URL, falling back to the ranking order
+            prop = next((prop for prop in properties if prop.url and f'href="{prop.url}"' in card), None)
+            if prop is None and position < len(properties):
+                prop = properties[position]
+            
+            with columns[position - row_start]:
+                tone = position % 5 + 1
+                st.markdown(
+                    f'<div class="card-container"><div class="property-card card-tone-{tone}">{card}</div>',
+                    unsafe_allow_html=True
+                )
+                if prop is not None:
+                    with st.expander("🔁 More plots like this"):
+                        show_similar_plots(prop)
+
+def show_similar_plot_lookup():
+    """Sidebar search for similar plots among every listing seen this session"""
+    index = st.session_state.plot_index
+    if not len(index):
+        return
+    
+    st.subheader("🔁 Similar Plots")
+    query = st.text_input("Find a plot by name or address", help="Includes listings from bulk crawls")
+    if not query:
+        return
+    
+    matches = index.find(query)
+    if not matches:
+        st.caption("No stored plot matches")
+        return
+    
+    labels = {key: f"{prop.building_name} · {prop.price} · {prop.location_address}" for key, prop in matches}
+    key = st.selectbox("Plot", options=list(labels), format_func=labels.get)
+    show_similar_plots(dict(matches)[key])
+
+def run_bulk_crawl(city, min_price, max_price, property_category, max_pages, redraw_seconds=15):
+    """Crawl every listing in the city and update the map while the crawl runs"""
+    status = st.empty()
+    map_placeholder = st.empty()
+    property_locations = []
+    crawl_status = CrawlStatus()
+    
+    # Small batches keep the map fresh; the crawl runs ahead in a background thread
+    batches = st.session_state.property_agent.crawl_properties(
+        city=city,
+        min_price=min_price,
+        max_price=max_price,
+        property_category=property_category,
+        batch_size=50,
+        max_pages=max_pages,
+        status=crawl_status
+    )
+    
+    def draw_map():
+        m = create_map_with_properties(
+            property_locations, city, cluster=True, price_grids=price_grids_for(property_locations)
+        )
+        with map_placeholder.container():
+            folium_static(m, width=800, height=500)
+    
+    st.subheader("🗺️ Property Map")
+    # Redrawing sends every marker again, so limit how often it happens and
+    # back off as the map grows so drawing takes at most a fifth of the time
+    next_draw = 0.0
+    mapped = 0
+    for batch, locations in st.session_state.mapping_agent.process_property_batches(batches, city):
+        st.session_state.plot_index.add_many(batch, [(loc.latitude, loc.longitude) for loc in locations])
+        property_locations.extend(locations)
+        # Addresses the geocoder could not place stay at (0, 0) and are left off the map
+        mapped += sum(1 for loc in locations if loc.latitude != 0.0 or loc.longitude != 0.0)
+        status.info(
+            f"🔄 Crawling page {crawl_status.pages_crawled}... "
+            f"{crawl_status.listings} plots found, {mapped} mapped so far"
         )
+        
+        if time.monotonic() >= next_draw:
+            draw_started = time.monotonic()
+            draw_map()
+            draw_seconds = time.monotonic() - draw_started
+            next_draw = time.monotonic() + max(redraw_seconds, 4 * draw_seconds)
+    
+    if property_locations:
+        draw_map()
+    
+    if not crawl_status.complete:
+        failed = ", ".join(str(page) for page in crawl_status.failed_pages) or "none"
+        status.warning(
+            f"⚠️ Bulk crawl incomplete ({crawl_status.stop_reason}): "
+            f"{len(property_locations)} plots found, {mapped} mapped, failed pages: {failed}"
+        )
+    elif property_locations:
+        status.success(f"✅ Bulk crawl completed: {len(property_locations)} plots found, {mapped} mapped")
+    else:
+        status.warning("⚠️ No plots found for this city")
+    
+    return property_locations
+
+def run_city_comparison(cities, min_price, max_price, property_category, max_workers, max_pages):
+    """Compare plot markets across several cities and show a summary table"""
+    with st.spinner(f"🏙️ Comparing {len(cities)} cities..."):
+        results = compare_cities(
+            cities,
+            st.session_state.property_agent,
+            st.session_state.mapping_agent,
+            min_price=min_price,
+            max_price=max_price,
+            property_category=property_category,
+            max_workers=max_workers,
+            max_pages=max_pages
+        )
+    
+    st.success("✅ City comparison completed!")
+    st.subheader("🏙️ City Comparison")
+    st.dataframe(
+        [result.model_dump(exclude={'mapped_count'}) for result in results],
+        use_container_width=True
+    )
+    st.caption(f"Medians are based on at most {max_pages} result pages per portal in each city.")
+    
+    return results
 
 def main():
     st.set_page_config(
@@ -37,6 +206,10 @@ def main():
     
     # Apply CSS styles
     apply_styles(st)
+    
+    # Listings seen in this session, for "more plots like this"
+    if 'plot_index' not in st.session_state:
+        st.session_state.plot_index = PlotSimilarityIndex()
 
     with st.sidebar:
         st.title("⚙️ Configuration")
@@ -48,6 +221,84 @@ def main():
             help="Select the AI model to use. Choose gpt-4o if your api doesn't have access to o3-mini"
         )
         st.session_state.model_id = model_id
+        
+        per_stage_routing = st.checkbox(
+            "Route models per stage",
+            help="Use the selected model for investment and trends analysis with a faster fallback, and a fast model for area insights"
+        )
+        st.session_state.per_stage_routing = per_stage_routing
+        
+        deadline_seconds = None
+        if per_stage_routing:
+            deadline_seconds = float(st.slider(
+                "Per-call Deadline (seconds)",
+                min_value=10,
+                max_value=300,
+                value=90,
+                step=10,
+                help="Calls close to this deadline fall back to a faster model"
+            ))
+        st.session_state.deadline_seconds = deadline_seconds
+        
+        if 'model_router' in st.session_state and st.session_state.model_router.latency_stats():
+            with st.expander("⏱️ Model Latency"):
+                st.dataframe(st.session_state.model_router.latency_stats(), use_container_width=True)
+        
+        st.subheader("🔎 Search Mode")
+        search_mode = st.radio(
+            "Choose Search Mode",
+            options=["Top picks", "Bulk crawl", "Multi-city comparison"],
+            help="Top picks analyses a handful of plots. Bulk crawl maps every listing in the city. "
+                 "Multi-city comparison summarises the plot markets of several cities side by side."
+        )
+        
+        ranking_weights = RankingWeights()
+        if search_mode == "Top picks":
+            with st.expander("⚖️ Ranking Weights"):
+                ranking_weights = RankingWeights(
+                    price_value=st.slider("Price vs locality", 0.0, 1.0, ranking_weights.price_value, 0.05),
+                    area=st.slider("Plot area", 0.0, 1.0, ranking_weights.area, 0.05),
+                    approval=st.slider("Construction approval", 0.0, 1.0, ranking_weights.approval, 0.05),
+                    centrality=st.slider("Central location", 0.0, 1.0, ranking_weights.centrality, 0.05)
+                )
+        
+        max_pages = 100
+        if search_mode == "Bulk crawl":
+            max_pages = st.number_input(
+                "Maximum Result Pages",
+                min_value=1,
+                max_value=1000,
+                value=100,
+                step=10,
+                help="Upper bound on result pages crawled per portal"
+            )
+        
+        max_workers = 4
+        comparison_pages = 5
+        if search_mode == "Multi-city comparison":
+            max_workers = st.slider(
+                "Parallel Cities",
+                min_value=1,
+                max_value=10,
+                value=4,
+                help="Number of cities processed at the same time. API rate limits apply across all of them."
+            )
+            comparison_pages = st.number_input(
+                "Result Pages per City",
+                min_value=1,
+                max_value=100,
+                value=5,
+                step=1,
+                help="Result pages crawled per portal for each city. More pages give steadier medians but take longer."
+            )
+        
+        st.subheader("🗺️ Map Options")
+        st.session_state.show_price_heatmap = st.checkbox(
+            "Show price heatmap",
+            help="Overlay median price per sq ft by area at several zoom levels"
+        )
+        
+        show_similar_plot_lookup()
 
     st.title("🏠 AI Plot Finder")
     st.info(
@@ -61,11 +312,18 @@ def main():
     col1, col2 = st.columns(2)
     
     with col1:
-        city = st.text_input(
-            "City",
-            placeholder="Enter city name (e.g., Bangalore)",
-            help="Enter the city where you want to search for plots"
-        )
+        if search_mode == "Multi-city comparison":
+            city = st.text_input(
+                "Cities",
+                placeholder="Enter city names separated by commas (e.g., Bangalore, Pune, Hyderabad)",
+                help="Enter the cities whose plot markets you want to compare"
+            )
+        else:
+            city = st.text_input(
+                "City",
+                placeholder="Enter city name (e.g., Bangalore)",
+                help="Enter the city where you want to search for plots"
+            )
         
         property_category = st.selectbox(
             "Property Category",
@@ -111,13 +369,28 @@ def main():
             
         try:
             create_agents()
+            if search_mode == "Bulk crawl":
+                run_bulk_crawl(city, min_price, max_price, property_category, int(max_pages))
+                return
+            
+            if search_mode == "Multi-city comparison":
+                run_city_comparison(
+                    city.split(","), min_price, max_price, property_category, max_workers, int(comparison_pages)
+                )
+                return
+            
             with st.spinner("🔍 Searching for plots..."):
+                # Locality price trends let the ranking compare each plot with its market
+                location_data = st.session_state.property_agent.get_location_trends_data(city)
                 property_results = st.session_state.property_agent.find_properties(
                     city=city,
                     min_price=min_price,
                     max_price=max_price,
                     property_category=property_category,
-                    property_type=property_type
+                    property_type=property_type,
+                    weights=ranking_weights,
+                    geocode=st.session_state.mapping_agent.geocode_address_cached,
+                    locality_medians={loc.location: loc.price_per_sqft for loc in location_data}
                 )
                 
                 st.success("✅ Plot search completed!")
@@ -129,39 +402,47 @@ def main():
                     html_cards = ""
                     analysis_text = property_results
                 
+                # Index every candidate once, with the coordinates used for ranking
+                candidates = st.session_state.property_agent.last_candidates
+                ranked = st.session_state.property_agent.last_ranked
+                coordinates = st.session_state.property_agent.last_coordinates
+                st.session_state.plot_index.add_many(
+                    candidates, [coordinates.get(listing_key(prop), (None, None)) for prop in candidates]
+                )
+                
                 st.subheader("🏘️ Recommended Plots")
                 # Render HTML cards
-                st.markdown(html_cards, unsafe_allow_html=True)
+                show_property_cards(html_cards, ranked)
                 
                 # Display analysis text
                 st.markdown(analysis_text)
                 
-                # Process raw property data for mapping
-                raw_response = st.session_state.property_agent.last_response
-                if isinstance(raw_response, dict) and raw_response.get('success'):
-                    properties = raw_response['data'].get('properties', [])
+                # Map every geocoded candidate, highlighting the recommended plots
+                property_locations = st.session_state.mapping_agent.locate_properties(
+                    candidates,
+                    [coordinates.get(listing_key(prop), (0.0, 0.0)) for prop in candidates],
+                    recommended={listing_key(prop) for prop in ranked}
+                )
+                located = [loc for loc in property_locations if loc.latitude != 0.0 or loc.longitude != 0.0]
+                
+                if located:
+                    st.subheader("🗺️ Property Map")
+                    st.caption("⭐ Green markers are the recommended plots, blue markers the other candidates")
+                    # Create and display map
+                    m = create_map_with_properties(located, city, price_grids=price_grids_for(located))
+                    folium_static(m, width=800, height=500)
                     
-                    with st.spinner("🗺️ Mapping property locations..."):
-                        # Use the mapping agent to get coordinates
-                        property_locations = st.session_state.mapping_agent.process_properties(properties, city)
-                        
-                        st.subheader("🗺️ Property Map")
-                        if property_locations:
-                            # Create and display map
-                            m = create_map_with_properties(property_locations, city)
-                            folium_static(m, width=800, height=500)
-                            
-                            # Geographic insights
-                            with st.expander("🧭 Geographic Analysis"):
-                                geo_insights = st.session_state.mapping_agent.generate_area_insights(property_locations, city)
-                                st.markdown(geo_insights)
-                        else:
-                            st.warning("⚠️ Could not map property locations")
+                    # Geographic insights
+                    with st.expander("🧭 Geographic Analysis"):
+                        geo_insights = st.session_state.mapping_agent.generate_area_insights(located, city)
+                        st.markdown(geo_insights)
+                else:
+                    st.warning("⚠️ Could not map property locations")
                 
                 st.divider()
                 
                 with st.spinner("📊 Analyzing location trends..."):
-                    location_trends = st.session_state.property_agent.get_location_trends(city)
+                    location_trends = st.session_state.property_agent.get_location_trends(city, locations=location_data)
                     
                     st.success("✅ Location analysis completed!")
                     
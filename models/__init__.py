@@ -4,5 +4,9 @@ from .schemas import (
     LocationData,
     LocationsResponse,
     FirecrawlResponse,
-    PropertyLocation
+    PropertyLocation,
+    CrawlStatus,
+    CityComparison,
+    PriceGridCell,
+    RankingWeights
 )
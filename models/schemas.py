@@ -1,8 +1,10 @@
 from typing import Dict, List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 class PropertyData(BaseModel):
     """Schema for property data extraction"""
+    model_config = ConfigDict(populate_by_name=True)
+    
     building_name: str = Field(description="Name of the building/property", alias="Building_name")
     property_type: str = Field(description="Type of property (commercial, residential, etc)", alias="Property_type")
     location_address: str = Field(description="Complete address of the property")
@@ -44,3 +46,41 @@ class PropertyLocation(BaseModel):
     longitude: float
     price: str
     url: Optional[str] = None
+    price_per_sqft: Optional[float] = None
+    recommended: bool = False  # Among the top picks of a search
+
+class CrawlStatus(BaseModel):
+    """Progress of a bulk crawl, filled in while its batches are consumed"""
+    pages_crawled: int = 0
+    listings: int = 0
+    failed_pages: List[int] = Field(default_factory=list)
+    complete: bool = False
+    stop_reason: Optional[str] = None
+
+class PriceGridCell(BaseModel):
+    """Schema for one aggregated price-per-sqft cell of the map heatmap"""
+    zoom: int
+    cell_id: str
+    latitude: float
+    longitude: float
+    boundary: List[List[float]] = Field(description="Cell polygon as [lon, lat] pairs")
+    median_price_per_sqft: float
+    count: int
+
+class CityComparison(BaseModel):
+    """Schema for one row of the multi-city market comparison"""
+    city: str
+    listing_count: int = 0
+    median_price_per_sqft: Optional[float] = None
+    median_appreciation: Optional[float] = None
+    locality_count: int = 0
+    mapped_count: Optional[int] = None
+    error: Optional[str] = None
+    property_locations: List[PropertyLocation] = Field(default_factory=list, exclude=True)
+
+class RankingWeights(BaseModel):
+    """Weights of the criteria used to rank plots locally"""
+    price_value: float = Field(default=0.4, ge=0, description="Price per sq ft below the locality median")
+    area: float = Field(default=0.2, ge=0, description="Larger plot area")
+    approval: float = Field(default=0.2, ge=0, description="Approved for construction")
+    centrality: float = Field(default=0.2, ge=0, description="Closeness to the centroid of the listings")
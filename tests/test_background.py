@@ -0,0 +1,51 @@
+import threading
+import time
+import pytest
+from utils import iterate_in_background
+
+def test_yields_items_in_order():
+    assert list(iterate_in_background(range(100), max_buffered=3)) == list(range(100))
+
+def test_reraises_producer_error_after_earlier_items():
+    def produce():
+        yield 1
+        yield 2
+        raise ValueError("page failed")
+
+    received = []
+    with pytest.raises(ValueError, match="page failed"):
+        for item in iterate_in_background(produce()):
+            received.append(item)
+    assert received == [1, 2]
+
+def test_producer_runs_ahead_by_at_most_the_buffer():
+    produced = []
+
+    def produce():
+        for item in range(100):
+            produced.append(item)
+            yield item
+
+    iterator = iterate_in_background(produce(), max_buffered=2)
+    assert next(iterator) == 0
+    time.sleep(0.3)
+    # Two buffered items plus one the producer is blocked on
+    assert len(produced) <= 4
+
+def test_stopping_early_closes_the_producer():
+    closed = threading.Event()
+
+    def produce():
+        try:
+            for item in range(1000):
+                yield item
+        finally:
+            closed.set()
+
+    iterator = iterate_in_background(produce(), max_buffered=2)
+    for item in iterator:
+        if item == 5:
+            break
+    iterator.close()
+
+    assert closed.wait(2.0)
@@ -0,0 +1,17 @@
+import agents.city_comparison as city_comparison
+from models import CityComparison
+
+def test_compare_cities_dedupes_ignoring_case(monkeypatch):
+    calls = []
+
+    def fake_compare_city(city, property_agent, mapping_agent, **kwargs):
+        calls.append((city, kwargs["max_pages"]))
+        return CityComparison(city=city)
+
+    monkeypatch.setattr(city_comparison, "compare_city", fake_compare_city)
+    results = city_comparison.compare_cities(
+        ["Pune", " pune", "", "Mumbai ", "PUNE"], None, None, max_price=5.0, max_pages=8
+    )
+
+    assert [result.city for result in results] == ["Pune", "Mumbai"]
+    assert sorted(calls) == [("Mumbai", 8), ("Pune", 8)]
@@ -0,0 +1,108 @@
+import re
+import pytest
+import agents.property_agent as property_agent
+from agents import PropertyFindingAgent
+from models import CrawlStatus
+from utils import RateLimiter
+
+def listing(name):
+    return {
+        "building_name": name,
+        "property_type": "Plot",
+        "location_address": f"{name}, Whitefield, Bangalore",
+        "price": "1 Cr",
+        "description": "",
+        "url": f"https://example.com/{name}"
+    }
+
+class FakeFirecrawl:
+    """Serves result pages from a dict of page -> listings, or a list of outcomes per attempt"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def extract(self, urls, params):
+        page = int(re.search(r"page=(\d+)", urls[0]).group(1))
+        self.calls.append(page)
+        outcome = self.pages.get(page, [])
+        if isinstance(outcome, tuple):
+            # One outcome per attempt, the last one repeats
+            attempt = self.calls.count(page) - 1
+            outcome = outcome[min(attempt, len(outcome) - 1)]
+        if isinstance(outcome, Exception):
+            raise outcome
+        if outcome is None:
+            return {"success": False}
+        return {"success": True, "data": {"properties": outcome}}
+
+@pytest.fixture
+def make_agent(monkeypatch):
+    # No backoff delays in tests
+    monkeypatch.setattr(property_agent.time, "sleep", lambda seconds: None)
+
+    def make(pages):
+        agent = PropertyFindingAgent("firecrawl-key", "openai-key", rate_limiter=RateLimiter(1000.0))
+        agent.firecrawl = FakeFirecrawl(pages)
+        return agent
+    return make
+
+def crawl(agent, **kwargs):
+    status = CrawlStatus()
+    batches = list(agent.crawl_properties("Bangalore", max_price=5.0, status=status, **kwargs))
+    return batches, status
+
+def test_crawl_stops_after_empty_pages_and_dedupes(make_agent):
+    agent = make_agent({
+        1: [listing("a"), listing("b")],
+        # The featured listing "a" repeats on later pages
+        2: [listing("a"), listing("c")],
+        3: [listing("a")],
+        4: [],
+    })
+    batches, status = crawl(agent, batch_size=2)
+
+    assert [[prop.building_name for prop in batch] for batch in batches] == [["a", "b"], ["c"]]
+    assert agent.firecrawl.calls == [1, 2, 3, 4]
+    assert status.listings == 3
+    assert status.complete
+    assert status.stop_reason == "no more listings"
+
+def test_crawl_retries_failed_page(make_agent):
+    agent = make_agent({
+        1: [listing("a")],
+        2: (RuntimeError("rate limited"), None, [listing("b")]),
+    })
+    batches, status = crawl(agent, max_retries=2)
+
+    assert agent.firecrawl.calls[:4] == [1, 2, 2, 2]
+    assert [prop.building_name for batch in batches for prop in batch] == ["a", "b"]
+    assert status.failed_pages == []
+    assert status.complete
+
+def test_crawl_gives_up_after_consecutive_failures(make_agent):
+    agent = make_agent({1: [listing("a")], 2: RuntimeError("down"), 3: None, 4: RuntimeError("down")})
+    batches, status = crawl(agent, max_retries=1, max_failed_pages=3)
+
+    assert status.failed_pages == [2, 3, 4]
+    assert status.pages_crawled == 4
+    assert not status.complete
+    assert status.stop_reason == "3 pages in a row failed"
+    # Listings found before the failures are still delivered
+    assert [prop.building_name for batch in batches for prop in batch] == ["a"]
+
+def test_crawl_with_a_failed_page_is_incomplete(make_agent):
+    agent = make_agent({1: [listing("a")], 2: None, 3: [listing("b")]})
+    _, status = crawl(agent, max_retries=0)
+
+    assert status.failed_pages == [2]
+    assert status.stop_reason == "no more listings"
+    assert not status.complete
+
+def test_crawl_stops_at_page_limit(make_agent):
+    agent = make_agent({page: [listing(str(page))] for page in range(1, 10)})
+    batches, status = crawl(agent, max_pages=3)
+
+    assert sum(len(batch) for batch in batches) == 3
+    assert not status.complete
+    assert status.stop_reason == "reached the 3 page limit"
@@ -0,0 +1,68 @@
+import pytest
+import agents.mapping_agent as mapping_agent
+from agents import LocationMappingAgent
+from models import PropertyData
+from utils import RateLimiter
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+@pytest.fixture
+def nominatim(monkeypatch):
+    """Fake Nominatim that knows Bangalore and one address, and records queries"""
+    queries = []
+    known = {"MG Road, Bangalore": ("12.97", "77.61"), "Bangalore": ("12.95", "77.59")}
+
+    def get(url, params, headers):
+        queries.append(params['q'])
+        if params['q'] == "Down Road, Bangalore":
+            raise ConnectionError("timed out")
+        if params['q'] in known:
+            lat, lon = known[params['q']]
+            return FakeResponse([{'lat': lat, 'lon': lon}])
+        return FakeResponse([])
+
+    monkeypatch.setattr(mapping_agent.requests, "get", get)
+    return queries
+
+@pytest.fixture
+def agent():
+    return LocationMappingAgent("openai-key", rate_limiter=RateLimiter(1000.0))
+
+def test_cached_geocoder_reports_unknown_address_as_missing(nominatim, agent):
+    assert agent.geocode_address_cached("MG Road", "Bangalore") == (12.97, 77.61)
+    # No city-centre fallback, which ranking would mistake for a central plot
+    assert agent.geocode_address_cached("Nowhere Lane", "Bangalore") == (0.0, 0.0)
+    assert agent.geocode_address_cached("nowhere lane ", "Bangalore") == (0.0, 0.0)
+    assert nominatim == ["MG Road, Bangalore", "Nowhere Lane, Bangalore"]
+
+def test_failed_requests_are_not_cached(nominatim, agent):
+    assert agent.geocode_address_cached("Down Road", "Bangalore") == (0.0, 0.0)
+    assert agent.geocode_address_cached("Down Road", "Bangalore") == (0.0, 0.0)
+    assert nominatim.count("Down Road, Bangalore") == 2
+
+def test_city_centre_is_looked_up_once(nominatim, agent):
+    assert agent.geocode_address("Nowhere Lane", "Bangalore") == (12.95, 77.59)
+    assert agent.geocode_address("Unknown Cross", "Bangalore") == (12.95, 77.59)
+    assert nominatim.count("Bangalore") == 1
+
+def test_locate_properties_marks_recommended(agent):
+    plots = [
+        PropertyData(building_name=name, property_type="Plot", location_address="MG Road",
+                     price="1 Cr", description="", url=f"https://example.com/{name}", area_sqft=1000)
+        for name in ("a", "b")
+    ]
+    locations = agent.locate_properties(
+        plots, [(12.97, 77.61), (0.0, 0.0)], start_idx=3, recommended={"https://example.com/b"}
+    )
+
+    assert [loc.property_id for loc in locations] == ["prop_3", "prop_4"]
+    assert [loc.recommended for loc in locations] == [False, True]
+    assert locations[0].price_per_sqft == pytest.approx(10000)
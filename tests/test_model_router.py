@@ -0,0 +1,115 @@
+import time
+import pytest
+import agents.model_router as model_router
+from agents.model_router import ModelRouter, default_stage_models
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+class FakeChat:
+    def __init__(self, id, api_key):
+        self.id = id
+
+@pytest.fixture
+def models(monkeypatch):
+    """Behaviour per model id: seconds to answer, or an exception to raise"""
+    behaviour = {}
+    runs = []
+
+    class FakeAgent:
+        def __init__(self, model, markdown, description):
+            self.model_id = model.id
+
+        def run(self, prompt):
+            runs.append(self.model_id)
+            outcome = behaviour[self.model_id]
+            if isinstance(outcome, Exception):
+                raise outcome
+            time.sleep(outcome)
+            return FakeResponse(self.model_id)
+
+    monkeypatch.setattr(model_router, "Agent", FakeAgent)
+    monkeypatch.setattr(model_router, "OpenAIChat", FakeChat)
+    behaviour["runs"] = runs
+    return behaviour
+
+def make_router(**kwargs):
+    return ModelRouter("key", default_model="fast", stage_models={"stage": ["slow", "fast"]}, **kwargs)
+
+def stats(router):
+    return {(row["model"], row["stage"]): row for row in router.latency_stats()}
+
+def test_default_stage_models_follow_selected_model():
+    assert default_stage_models("o3-mini")["investment_analysis"] == ["o3-mini", "gpt-4o-mini"]
+    assert default_stage_models("gpt-4o-mini")["trends_analysis"] == ["gpt-4o-mini"]
+
+def test_without_deadline_uses_first_model(models):
+    models.update(slow=0.05, fast=0.0)
+    router = make_router()
+
+    assert router.run("stage", "prompt", "description") == "slow"
+    row = stats(router)[("slow", "stage")]
+    assert row["calls"] == 1 and row["avg_latency_s"] >= 0.05
+
+def test_timeout_falls_back_and_backs_off(models):
+    models.update(slow=1.0, fast=0.01)
+    router = make_router(deadline_seconds=0.5)
+
+    for _ in range(5):
+        assert router.run("stage", "prompt", "description") == "fast"
+
+    # Only the first call waited for the slow model, later calls skip it during the cooldown
+    assert models["runs"].count("slow") == 1
+    row = stats(router)[("slow", "stage")]
+    assert row["timeouts"] == 1 and row["calls"] == 0 and row["avg_latency_s"] is None
+    assert stats(router)[("fast", "stage")]["calls"] == 5
+
+def test_timed_out_model_is_retried_after_cooldown(models):
+    models.update(slow=1.0, fast=0.01)
+    router = make_router(deadline_seconds=0.5, cooldown_seconds=0.2)
+
+    router.run("stage", "prompt", "description")
+    time.sleep(0.25)
+    models["slow"] = 0.01
+    assert router.run("stage", "prompt", "description") == "slow"
+
+def test_deadline_skips_model_expected_to_be_too_slow(models):
+    models.update(slow=0.0, fast=0.0)
+    router = make_router(deadline_seconds=1.0)
+    router.record_latency("slow", "stage", 5.0)
+
+    assert router.run("stage", "prompt", "description") == "fast"
+    assert "slow" not in models["runs"]
+
+def test_failures_fall_back_and_rest_the_model(models):
+    models.update(slow=RuntimeError("model not available"), fast=0.0)
+    router = make_router(cooldown_seconds=0.2)
+
+    for _ in range(3):
+        assert router.run("stage", "prompt", "description") == "fast"
+
+    # Rested after two consecutive errors, then tried again once the cooldown ends
+    assert models["runs"].count("slow") == 2
+    assert router.models_for("stage") == ["fast"]
+    assert stats(router)[("slow", "stage")]["failures"] == 2
+
+    time.sleep(0.25)
+    models["slow"] = 0.0
+    assert router.models_for("stage") == ["slow", "fast"]
+    assert router.run("stage", "prompt", "description") == "slow"
+
+def test_raises_when_every_model_fails(models):
+    models.update(slow=RuntimeError("down"), fast=RuntimeError("down"))
+    router = make_router()
+
+    with pytest.raises(RuntimeError, match="down"):
+        router.run("stage", "prompt", "description")
+
+def test_latency_is_a_moving_average(models):
+    router = make_router(smoothing=0.5)
+    router.record_latency("fast", "stage", 1.0)
+    router.record_latency("fast", "stage", 3.0)
+
+    assert router.expected_latency("fast", "stage") == pytest.approx(2.0)
+    assert stats(router)[("fast", "stage")]["calls"] == 2
@@ -0,0 +1,25 @@
+import pytest
+from utils.price_utils import parse_price, price_per_sqft
+
+@pytest.mark.parametrize("price, expected", [
+    ("₹1.2 Cr", 1.2e7),
+    ("1.2 crs", 1.2e7),
+    ("1.5 Crore", 1.5e7),
+    ("45 Lac", 4.5e6),
+    ("Rs. 30 lakhs", 3e6),
+    ("2 Million", 2e6),
+    ("₹ 85,00,000", 8.5e6),
+    ("50 L - 1 Cr", 5e6),
+    ("1.5", 1.5e7),  # Bare numbers are crores, as in the extraction prompts
+])
+def test_parse_price(price, expected):
+    assert parse_price(price) == pytest.approx(expected)
+
+@pytest.mark.parametrize("price", [None, "", "Price on request", "5000"])
+def test_parse_price_unreadable(price):
+    assert parse_price(price) is None
+
+def test_price_per_sqft():
+    assert price_per_sqft("50 Lac", 1000) == pytest.approx(5000)
+    assert price_per_sqft("50 Lac", None) is None
+    assert price_per_sqft("On request", 1000) is None
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from models.schemas import PropertyData, RankingWeights
+from utils.ranking import MIN_LOCALITY_LISTINGS, _locality_medians_for, rank_properties, score_properties
+
+def make_plot(name, price="1 Cr", area=1000.0, address="Whitefield, Bangalore", approved=None):
+    return PropertyData(
+        building_name=name,
+        property_type="Plot",
+        location_address=address,
+        price=price,
+        description="",
+        url=f"https://example.com/{name}",
+        area_sqft=area,
+        approved_for_construction=approved
+    )
+
+def test_locality_medians_match_brute_force():
+    rng = np.random.default_rng(0)
+    localities = ["whitefield", "hsr layout", "yelahanka", "sarjapur"]
+    plots = [make_plot(str(i), address=f"Road {i}, {rng.choice(localities)}, Bangalore") for i in range(200)]
+    rates = rng.uniform(3000, 15000, len(plots))
+    rates[rng.random(len(plots)) < 0.2] = np.nan
+    # A locality with too few priced listings falls back to the overall median
+    plots.append(make_plot("lone", address="Hebbal, Bangalore"))
+    rates = np.append(rates, 9000.0)
+
+    reference = _locality_medians_for(plots, rates, None)
+
+    overall = np.nanmedian(rates)
+    for idx, prop in enumerate(plots):
+        locality = prop.location_address.split(",")[-2].strip().lower()
+        group = [rates[j] for j, other in enumerate(plots)
+                 if other.location_address.split(",")[-2].strip().lower() == locality and np.isfinite(rates[j])]
+        expected = np.median(group) if len(group) >= MIN_LOCALITY_LISTINGS else overall
+        assert reference[idx] == pytest.approx(expected)
+
+def test_trend_medians_prefer_longest_locality():
+    plots = [make_plot("a", address="HSR Layout Sector 2, Bangalore"), make_plot("b", address="HSR Layout, Bangalore")]
+    reference = _locality_medians_for(
+        plots, np.array([8000.0, 8000.0]), {"HSR Layout": 7000.0, "HSR Layout Sector 2": 9000.0}
+    )
+    assert list(reference) == [9000.0, 7000.0]
+
+def test_rank_matches_full_sort():
+    rng = np.random.default_rng(1)
+    plots = [
+        make_plot(str(i), price=f"{rng.uniform(0.5, 3):.2f} Cr", area=float(rng.uniform(600, 4000)),
+                  approved=bool(rng.integers(2)))
+        for i in range(50)
+    ]
+    scores = score_properties(plots)
+    expected = [plots[idx] for idx in np.argsort(-scores, kind="stable")[:5]]
+    assert rank_properties(plots, top_k=5) == expected
+
+def test_rank_uses_coordinates_for_centrality():
+    plots = [make_plot("edge"), make_plot("centre"), make_plot("other")]
+    coordinates = [(13.10, 77.70), (12.97, 77.59), (12.95, 77.57)]
+    weights = RankingWeights(price_value=0, area=0, approval=0, centrality=1)
+
+    assert rank_properties(plots, top_k=1, weights=weights, coordinates=coordinates)[0].building_name == "centre"
+    # Without coordinates centrality is neutral for every plot
+    assert np.allclose(score_properties(plots, weights=weights), 0.5)
+
+def test_rank_filters_price_range_keeping_unknown_prices():
+    plots = [make_plot("cheap", price="20 Lac"), make_plot("ok", price="1.5 Cr"),
+             make_plot("dear", price="8 Cr"), make_plot("unknown", price="On request")]
+    ranked = rank_properties(plots, top_k=10, min_price=0.5, max_price=5)
+    assert {prop.building_name for prop in ranked} == {"ok", "unknown"}
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from models.schemas import PropertyData
+from utils.similarity_index import NUMERIC_DIMENSIONS, PlotSimilarityIndex, listing_key
+
+WORDS = ["gated", "corner", "east", "facing", "bmrda", "approved", "near", "metro", "lake", "view"]
+
+def make_plot(name, price=None, area=None, description=""):
+    return PropertyData(
+        building_name=name,
+        property_type="Plot",
+        location_address=f"{name}, Bangalore",
+        price=price or "",
+        description=description,
+        url=f"https://example.com/{name}",
+        area_sqft=area
+    )
+
+def random_plots(rng, n):
+    """Plots with a random mix of missing price, area, position and description"""
+    plots, coordinates = [], []
+    for i in range(n):
+        plots.append(make_plot(
+            str(i),
+            price=f"{rng.uniform(0.3, 5):.2f} Cr" if rng.random() < 0.8 else None,
+            area=float(rng.uniform(600, 5000)) if rng.random() < 0.8 else None,
+            description=" ".join(rng.choice(WORDS, 4)) if rng.random() < 0.7 else ""
+        ))
+        located = rng.random() < 0.7
+        coordinates.append((12.97 + rng.normal(0, 0.1), 77.59 + rng.normal(0, 0.1)) if located else (None, None))
+    return plots, coordinates
+
+def brute_force_distance(index, a, b):
+    """Masked squared distance computed feature by feature"""
+    (x, mx), (q, mq) = a, b
+    weights = list(index._penalty_weights) + [index._text_penalty]
+    distance = 0.0
+    # Numeric features one by one, then the text embedding as one feature
+    features = [(x[i], mx[i], q[i], mq[i]) for i in range(NUMERIC_DIMENSIONS)]
+    features.append((x[NUMERIC_DIMENSIONS:], mx[-1], q[NUMERIC_DIMENSIONS:], mq[-1]))
+    for (xv, xm, qv, qm), weight in zip(features, weights):
+        if xm and qm:
+            distance += float(np.sum((np.asarray(xv, dtype=float) - qv) ** 2))
+        elif xm or qm:
+            distance += weight
+    return distance
+
+@pytest.mark.parametrize("text_weight, missing_penalty", [(1.0, 1.0), (2.0, 0.5)])
+def test_query_matches_brute_force(text_weight, missing_penalty):
+    rng = np.random.default_rng(0)
+    index = PlotSimilarityIndex(text_weight=text_weight, missing_penalty=missing_penalty, initial_capacity=4)
+    plots, coordinates = random_plots(rng, 300)
+    index.add_many(plots, coordinates)
+    stored = {listing_key(prop): index._vectorize(prop, lat, lon) for prop, (lat, lon) in zip(plots, coordinates)}
+
+    queries, query_coordinates = random_plots(np.random.default_rng(1), 20)
+    for query, (lat, lon) in zip(queries, query_coordinates):
+        query = query.model_copy(update={"url": f"query-{query.url}"})
+        vector = index._vectorize(query, lat, lon)
+        results = index.query(query, k=len(plots), latitude=lat, longitude=lon)
+
+        assert len(results) == len(plots)
+        for prop, distance in results:
+            expected = brute_force_distance(index, stored[listing_key(prop)], vector)
+            assert distance ** 2 == pytest.approx(expected, rel=1e-4, abs=1e-3)
+        assert [distance for _, distance in results] == sorted(distance for _, distance in results)
+
+def test_update_without_coordinates_keeps_position():
+    index = PlotSimilarityIndex()
+    near = make_plot("near", price="1 Cr", area=1200)
+    far = make_plot("far", price="1 Cr", area=1200)
+    query = make_plot("query", price="1 Cr", area=1200)
+    index.add(near, 12.97, 77.59)
+    index.add(far, 13.20, 77.90)
+
+    # Re-adding without a position, as the top-picks flow may, must not drop the stored one
+    index.add(near)
+    index.add(far, 0.0, 0.0)
+
+    results = index.query(query, k=2, latitude=12.97, longitude=77.59)
+    assert [prop.building_name for prop, _ in results] == ["near", "far"]
+    assert results[0][1] == pytest.approx(0.0, abs=1e-3)
+
+def test_neighbours_exclude_the_listing():
+    index = PlotSimilarityIndex()
+    plots = [make_plot(str(i), price=f"{1 + i / 10} Cr", area=1000) for i in range(5)]
+    index.add_many(plots)
+
+    neighbours = index.neighbours(listing_key(plots[2]), k=10)
+    assert len(neighbours) == 4
+    assert {prop.building_name for prop, _ in neighbours[:2]} == {"1", "3"}
+    assert index.neighbours("missing") == []
+
+def test_find_matches_name_or_address():
+    index = PlotSimilarityIndex()
+    index.add_many([make_plot("Green Meadows"), make_plot("Lake View"), make_plot("Meadow Park")])
+
+    assert [prop.building_name for _, prop in index.find("meadow")] == ["Green Meadows", "Meadow Park"]
+    assert [key for key, _ in index.find("bangalore", limit=1)] == ["https://example.com/Green Meadows"]
+    assert index.find("hebbal") == []
@@ -0,0 +1,58 @@
+from collections import defaultdict
+import numpy as np
+import pytest
+from utils.spatial_aggregation import SQRT3, _hex_cells, aggregate_prices
+
+# Axial offsets of the six neighbouring hexagons
+HEX_NEIGHBOURS = [(1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1)]
+
+def _hex_centre(q, r, size):
+    return size * SQRT3 * (q + r / 2.0), size * 1.5 * r
+
+def test_hex_cells_assign_nearest_centre():
+    rng = np.random.default_rng(0)
+    size = 0.01
+    x, y = rng.uniform(-0.5, 0.5, 5000), rng.uniform(-0.5, 0.5, 5000)
+    iq, ir, cx, cy = _hex_cells(x, y, size)
+
+    assert np.allclose((cx, cy), _hex_centre(iq, ir, size))
+    distance = np.hypot(x - cx, y - cy)
+    assert (distance <= size + 1e-12).all()
+    for dq, dr in HEX_NEIGHBOURS:
+        nx, ny = _hex_centre(iq + dq, ir + dr, size)
+        assert (distance <= np.hypot(x - nx, y - ny) + 1e-12).all()
+
+@pytest.mark.parametrize("shape", ["hex", "square"])
+def test_aggregate_prices_matches_brute_force(shape):
+    rng = np.random.default_rng(1)
+    n = 2000
+    lat = 12.97 + rng.normal(0, 0.05, n)
+    lon = 77.59 + rng.normal(0, 0.05, n)
+    values = rng.uniform(3000, 15000, n)
+    # Listings that failed geocoding or have no rate are ignored
+    lat[:10], lon[:10] = 0.0, 0.0
+    values[10:20] = np.nan
+
+    cells = aggregate_prices(lat, lon, values, cell_size=0.01, shape=shape, zoom=12)
+
+    valid = slice(20, None)
+    lon_scale = np.cos(np.radians(lat[valid].mean()))
+    x = lon[valid] * lon_scale
+    if shape == "hex":
+        ia, ib, _, _ = _hex_cells(x, lat[valid], 0.01 / SQRT3)
+    else:
+        ia, ib = np.floor(x / 0.01).astype(int), np.floor(lat[valid] / 0.01).astype(int)
+
+    expected = defaultdict(list)
+    for a, b, value in zip(ia, ib, values[valid]):
+        expected[f"{shape}:12:{a}:{b}"].append(value)
+
+    assert {cell.cell_id for cell in cells} == set(expected)
+    assert sum(cell.count for cell in cells) == n - 20
+    for cell in cells:
+        assert cell.count == len(expected[cell.cell_id])
+        assert cell.median_price_per_sqft == pytest.approx(np.median(expected[cell.cell_id]))
+        assert cell.boundary[0] == cell.boundary[-1]
+
+def test_aggregate_prices_empty():
+    assert aggregate_prices([0.0], [0.0], [5000.0], cell_size=0.01) == []
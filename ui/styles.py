@@ -29,28 +29,33 @@ PROPERTY_CARD_CSS = """
     box-shadow: 0 12px 20px rgba(0,0,0,0.2);
 }
 
-/* Card color variations - pastel colors */
-.property-card:nth-child(5n+1) {
+/* Card color variations - pastel colors; card-tone-N for cards rendered on their own */
+.property-card:nth-child(5n+1),
+.property-card.card-tone-1 {
     background-color: #E0F7FA; /* Light blue */
     color: #006064;
 }
 
-.property-card:nth-child(5n+2) {
+.property-card:nth-child(5n+2),
+.property-card.card-tone-2 {
     background-color: #F1F8E9; /* Light green */
     color: #33691E;
 }
 
-.property-card:nth-child(5n+3) {
+.property-card:nth-child(5n+3),
+.property-card.card-tone-3 {
     background-color: #FFF3E0; /* Light orange */
     color: #E65100;
 }
 
-.property-card:nth-child(5n+4) {
+.property-card:nth-child(5n+4),
+.property-card.card-tone-4 {
     background-color: #FCE4EC; /* Light pink */
     color: #880E4F;
 }
 
-.property-card:nth-child(5n+5) {
+.property-card:nth-child(5n+5),
+.property-card.card-tone-5 {
     background-color: #E8EAF6; /* Light indigo */
     color: #1A237E;
 }
@@ -124,27 +129,32 @@ PROPERTY_CARD_CSS = """
 }
 
 /* CTA button color variations to match card colors */
-.property-card:nth-child(5n+1) .property-cta {
+.property-card:nth-child(5n+1) .property-cta,
+.property-card.card-tone-1 .property-cta {
     background-color: #006064;
     color: white !important;
 }
 
-.property-card:nth-child(5n+2) .property-cta {
+.property-card:nth-child(5n+2) .property-cta,
+.property-card.card-tone-2 .property-cta {
     background-color: #33691E;
     color: white !important;
 }
 
-.property-card:nth-child(5n+3) .property-cta {
+.property-card:nth-child(5n+3) .property-cta,
+.property-card.card-tone-3 .property-cta {
     background-color: #E65100;
     color: white !important;
 }
 
-.property-card:nth-child(5n+4) .property-cta {
+.property-card:nth-child(5n+4) .property-cta,
+.property-card.card-tone-4 .property-cta {
     background-color: #880E4F;
     color: white !important;
 }
 
-.property-card:nth-child(5n+5) .property-cta {
+.property-card:nth-child(5n+5) .property-cta,
+.property-card.card-tone-5 .property-cta {
     background-color: #1A237E;
     color: white !important;
 }
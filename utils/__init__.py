@@ -1 +1,7 @@
-from .map_utils import create_map_with_properties
+from .map_utils import create_map_with_properties, add_price_heatmap_layer
+from .rate_limit import RateLimiter
+from .background import iterate_in_background
+from .price_utils import parse_price, price_per_sqft
+from .spatial_aggregation import aggregate_prices, precompute_price_grids
+from .ranking import rank_properties, score_properties
+from .similarity_index import PlotSimilarityIndex, embed_text, listing_key
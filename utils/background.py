@@ -0,0 +1,56 @@
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+def iterate_in_background(iterable: Iterable[T], max_buffered: int = 2) -> Iterator[T]:
+    """Consume an iterable in a producer thread, buffering a bounded number of items
+    
+    The producer runs ahead of the caller by at most ``max_buffered`` items,
+    so slow consumers (e.g. rate limited geocoding) overlap with the work of
+    the producer without unbounded memory. Exceptions from the producer are
+    re-raised in the caller, and the producer stops once the caller stops
+    iterating.
+    """
+    buffer = queue.Queue(maxsize=max(1, max_buffered))
+    stop = threading.Event()
+    
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except Exception as e:
+            put((_DONE, e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+    
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
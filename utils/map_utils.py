@@ -1,11 +1,133 @@
 import folium
-from typing import List, Tuple
-from models.schemas import PropertyLocation
+import numpy as np
+from branca.colormap import LinearColormap
+from branca.element import MacroElement
+from folium.plugins import FastMarkerCluster
+from jinja2 import Template
+from typing import Dict, List, Optional, Tuple
+from models.schemas import PriceGridCell, PropertyLocation
 from agents.mapping_agent import LocationMappingAgent
 import os
 
-def create_map_with_properties(property_locations: List[PropertyLocation], city: str):
-    """Create a folium map with property markers"""
+# Builds a clustered marker from a [lat, lon, popup, tooltip] row
+CLUSTER_MARKER_CALLBACK = """
+    function (row) {
+        var icon = L.AwesomeMarkers.icon({icon: "home", markerColor: "blue", prefix: "glyphicon"});
+        return L.marker(new L.LatLng(row[0], row[1]), {icon: icon})
+            .bindPopup(row[2], {maxWidth: 300})
+            .bindTooltip(row[3]);
+    }
+"""
+
+class _ZoomGridLayer(MacroElement):
+    """Price grids keyed by zoom, drawing only the level nearest the map zoom"""
+    
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var grids = {{ this.grids|tojson }};
+            var layers = {};
+            
+            function buildGrid(zoom) {
+                var grid = grids[zoom];
+                return L.featureGroup(grid.cells.map(function(cell) {
+                    var outline = grid.outline.map(function(offset) {
+                        return [cell[0] + offset[0], cell[1] + offset[1]];
+                    });
+                    return L.polygon(outline, {
+                        color: "#555555", weight: 0.5, fillOpacity: 0.6, fillColor: cell[4]
+                    }).bindTooltip("Median ₹/sq ft: " + cell[2].toLocaleString() + "<br>Listings: " + cell[3]);
+                }));
+            }
+            
+            var shown = null;
+            function showNearestGrid() {
+                var current = map.getZoom();
+                var nearest = Object.keys(grids).reduce(function(best, zoom) {
+                    return Math.abs(zoom - current) < Math.abs(best - current) ? zoom : best;
+                });
+                if (nearest === shown) {
+                    return;
+                }
+                if (shown !== null) {
+                    map.removeLayer(layers[shown]);
+                }
+                // Polygons are only built the first time their level is shown
+                layers[nearest] = layers[nearest] || buildGrid(nearest);
+                layers[nearest].addTo(map);
+                shown = nearest;
+            }
+            map.on("zoomend", showNearestGrid);
+            showNearestGrid();
+        })();
+        {% endmacro %}
+    """)
+    
+    def __init__(self, grids: Dict[int, dict]):
+        super().__init__()
+        self._name = "ZoomGridLayer"
+        self.grids = grids
+
+def add_price_heatmap_layer(m: folium.Map, price_grids: Dict[int, List[PriceGridCell]]):
+    """Add a choropleth of median price per sq ft that follows the map zoom
+    
+    Each zoom level's grid is embedded compactly with its colours
+    precomputed, and only the grid nearest the current zoom is drawn.
+    """
+    medians = [cell.median_price_per_sqft for cells in price_grids.values() for cell in cells]
+    if not medians:
+        return m
+    
+    # Clip the colour scale to the 5th-95th percentile so outliers don't wash it out
+    vmin, vmax = np.percentile(medians, [5, 95])
+    colormap = LinearColormap(
+        ["#2b83ba", "#ffffbf", "#d7191c"],
+        vmin=float(vmin),
+        vmax=float(max(vmax, vmin + 1)),
+        caption="Median price per sq ft (₹)"
+    )
+    
+    # Cells of one level share their shape, so embed the outline once as
+    # offsets from the centre and each cell as [lat, lon, median, count, colour]
+    grids = {
+        zoom: {
+            "outline": [
+                [round(lat - cells[0].latitude, 6), round(lon - cells[0].longitude, 6)]
+                for lon, lat in cells[0].boundary
+            ],
+            "cells": [
+                [
+                    round(cell.latitude, 5),
+                    round(cell.longitude, 5),
+                    round(cell.median_price_per_sqft),
+                    cell.count,
+                    colormap.rgb_hex_str(cell.median_price_per_sqft)
+                ]
+                for cell in cells
+            ]
+        }
+        for zoom, cells in sorted(price_grids.items())
+        if cells
+    }
+    
+    _ZoomGridLayer(grids).add_to(m)
+    colormap.add_to(m)
+    return m
+
+def create_map_with_properties(
+    property_locations: List[PropertyLocation],
+    city: str,
+    cluster: bool = False,
+    price_grids: Optional[Dict[int, List[PriceGridCell]]] = None
+):
+    """Create a folium map with property markers
+    
+    Set ``cluster`` for large result sets so nearby markers are grouped
+    and built in the browser instead of drawing thousands of individual
+    pins. Recommended properties get a highlighted marker. ``price_grids``
+    from ``precompute_price_grids`` adds a price-per-sq-ft heatmap layer.
+    """
     # Calculate the average lat and lon to center the map
     if not property_locations:
         # Default to city center (will be obtained via geocoding)
@@ -22,27 +144,46 @@ def create_map_with_properties(property_locations: List[PropertyLocation], city:
     
     # Create map
     m = folium.Map(location=map_center, zoom_start=12)
+    valid_properties = [loc for loc in property_locations if loc.latitude != 0.0 or loc.longitude != 0.0]
     
-    # Add markers for each property
-    for loc in property_locations:
-        if loc.latitude == 0.0 and loc.longitude == 0.0:
-            continue  # Skip properties with invalid coordinates
-            
-        # Create popup content
-        popup_html = f"""
-        <div style="width:250px">
-            <h4>{loc.property_name}</h4>
-            <p><b>Price:</b> {loc.price}</p>
-            <p><b>Address:</b> {loc.address}</p>
-            <p><a href="{loc.url}" target="_blank">View Property</a></p>
-        </div>
-        """
-        
-        folium.Marker(
-            location=[loc.latitude, loc.longitude],
-            popup=folium.Popup(popup_html, max_width=300),
-            tooltip=f"{loc.property_name} - {loc.price}",
-            icon=folium.Icon(color="blue", icon="home")
+    if cluster:
+        # Markers are built in the browser from compact rows, which keeps
+        # redraws of tens of thousands of listings fast and small
+        FastMarkerCluster(
+            [
+                [
+                    loc.latitude,
+                    loc.longitude,
+                    f'<b>{loc.property_name}</b><br>{loc.price}<br>{loc.address}<br>'
+                    f'<a href="{loc.url}" target="_blank">View Property</a>',
+                    f"{loc.property_name} - {loc.price}"
+                ]
+                for loc in valid_properties
+            ],
+            callback=CLUSTER_MARKER_CALLBACK
         ).add_to(m)
+    else:
+        # Add markers for each property
+        for loc in valid_properties:
+            # Create popup content
+            popup_html = f"""
+            <div style="width:250px">
+                <h4>{loc.property_name}</h4>
+                <p><b>Price:</b> {loc.price}</p>
+                <p><b>Address:</b> {loc.address}</p>
+                <p><a href="{loc.url}" target="_blank">View Property</a></p>
+            </div>
+            """
+            
+            folium.Marker(
+                location=[loc.latitude, loc.longitude],
+                popup=folium.Popup(popup_html, max_width=300),
+                tooltip=f"{'⭐ ' if loc.recommended else ''}{loc.property_name} - {loc.price}",
+                icon=folium.Icon(color="green", icon="star") if loc.recommended
+                else folium.Icon(color="blue", icon="home")
+            ).add_to(m)
+    
+    if price_grids:
+        add_price_heatmap_layer(m, price_grids)
     
     return m
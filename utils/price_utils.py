@@ -0,0 +1,62 @@
+import re
+from typing import Optional
+
+# Multipliers for the units used by the listing portals
+PRICE_UNITS = {
+    'cr': 1e7,
+    'crs': 1e7,
+    'crore': 1e7,
+    'crores': 1e7,
+    'l': 1e5,
+    'lac': 1e5,
+    'lacs': 1e5,
+    'lakh': 1e5,
+    'lakhs': 1e5,
+    'mn': 1e6,
+    'million': 1e6,
+    'millions': 1e6,
+    'k': 1e3,
+    'thousand': 1e3,
+}
+
+CRORE = 1e7
+# Unitless amounts below this are in crores, the unit the extraction prompts ask for
+UNITLESS_CRORE_LIMIT = 1000
+# Unitless amounts from this size up are in rupees, e.g. "85,00,000"
+UNITLESS_RUPEE_MIN = 1e5
+
+PRICE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([a-z]+)?")
+
+def parse_price(price: Optional[str]) -> Optional[float]:
+    """Convert a listing price such as "₹1.2 Cr" or "85,00,000" to rupees
+    
+    For ranges like "50 L - 1 Cr" the lower bound is returned. A number
+    without a known unit is read as crores when small ("1.5") and as rupees
+    when large. Returns None when no number can be found or a unitless
+    amount is too ambiguous to read.
+    """
+    if not price:
+        return None
+    
+    text = price.lower().replace(',', '')
+    match = PRICE_PATTERN.search(text)
+    if not match:
+        return None
+    
+    value = float(match.group(1))
+    unit = match.group(2)
+    if unit in PRICE_UNITS:
+        return value * PRICE_UNITS[unit]
+    
+    if value < UNITLESS_CRORE_LIMIT:
+        return value * CRORE
+    if value >= UNITLESS_RUPEE_MIN:
+        return value
+    return None
+
+def price_per_sqft(price: Optional[str], area_sqft: Optional[float]) -> Optional[float]:
+    """Price per square foot in rupees, or None if either value is unusable"""
+    amount = parse_price(price)
+    if amount is None or not area_sqft or area_sqft <= 0:
+        return None
+    return amount / area_sqft
@@ -0,0 +1,170 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from models.schemas import PropertyData, RankingWeights
+from utils.price_utils import CRORE, parse_price
+
+# Listings needed before a locality's own median is trusted
+MIN_LOCALITY_LISTINGS = 3
+
+def _address_locality(address: str) -> str:
+    """Best guess at the locality, the segment before the city in the address"""
+    parts = [part.strip().lower() for part in address.split(',') if part.strip()]
+    if len(parts) >= 2:
+        return parts[-2]
+    return parts[0] if parts else ""
+
+def _locality_medians_for(
+    properties: List[PropertyData],
+    rates: np.ndarray,
+    locality_medians: Optional[Dict[str, float]]
+) -> np.ndarray:
+    """Reference price per sq ft for each property
+
+    Uses the trend median of a known locality named in the address, then
+    the median of candidates in the same locality, and the median of all
+    candidates otherwise.
+    """
+    fallback = np.nanmedian(rates) if np.isfinite(rates).any() else np.nan
+    reference = np.full(len(properties), fallback)
+
+    keys = np.array([_address_locality(prop.location_address) for prop in properties])
+    _, groups = np.unique(keys, return_inverse=True)
+
+    # Sort by locality then rate; NaN rates sort to the end of each locality
+    order = np.lexsort((rates, groups))
+    sorted_rates = rates[order]
+    sizes = np.bincount(groups)
+    finite = np.bincount(groups, weights=np.isfinite(rates)).astype(int)
+    starts = np.cumsum(sizes) - sizes
+    trusted = finite >= MIN_LOCALITY_LISTINGS
+    group_medians = np.full(sizes.size, np.nan)
+    group_medians[trusted] = (
+        sorted_rates[starts[trusted] + finite[trusted] // 2]
+        + sorted_rates[starts[trusted] + (finite[trusted] - 1) // 2]
+    ) / 2
+    reference = np.where(np.isfinite(group_medians[groups]), group_medians[groups], reference)
+
+    if not locality_medians:
+        return reference
+
+    # Longest names first so "HSR Layout Sector 2" wins over "HSR Layout"
+    localities = sorted(locality_medians.items(), key=lambda item: -len(item[0]))
+    for idx, prop in enumerate(properties):
+        address = prop.location_address.lower()
+        for locality, median in localities:
+            if median and locality.lower() in address:
+                reference[idx] = median
+                break
+    return reference
+
+def _parse_prices(properties: List[PropertyData]) -> np.ndarray:
+    """Listing prices in rupees, NaN where the price is unreadable"""
+    return np.array([parse_price(prop.price) or np.nan for prop in properties], dtype=float)
+
+def score_properties(
+    properties: List[PropertyData],
+    weights: Optional[RankingWeights] = None,
+    locality_medians: Optional[Dict[str, float]] = None,
+    coordinates: Optional[Sequence[Tuple[float, float]]] = None
+) -> np.ndarray:
+    """Weighted score in [0, 1] for each property, higher is better
+
+    Each criterion is scaled to [0, 1]. Missing values score a neutral 0.5,
+    except a missing area which scores 0. Without coordinates the
+    centrality term is neutral for every plot and does not affect order.
+    """
+    return _score(properties, _parse_prices(properties), weights, locality_medians, coordinates)
+
+def _score(
+    properties: List[PropertyData],
+    prices: np.ndarray,
+    weights: Optional[RankingWeights],
+    locality_medians: Optional[Dict[str, float]],
+    coordinates: Optional[Sequence[Tuple[float, float]]]
+) -> np.ndarray:
+    weights = weights or RankingWeights()
+    n = len(properties)
+    if n == 0:
+        return np.zeros(0)
+
+    areas = np.array([prop.area_sqft or np.nan for prop in properties], dtype=float)
+    approved = np.array(
+        [np.nan if prop.approved_for_construction is None else float(prop.approved_for_construction) for prop in properties],
+        dtype=float
+    )
+    areas[areas <= 0] = np.nan
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Price: 1 when free, 0.5 at the locality median, 0 at twice the median
+        rates = prices / areas
+        relative = rates / _locality_medians_for(properties, rates, locality_medians)
+        price_score = np.clip(2 - relative, 0, 2) / 2
+        price_score = np.where(np.isfinite(price_score), price_score, 0.5)
+
+        # Area: log scale min-max across the candidates
+        log_area = np.log(areas)
+        spread = np.nanmax(log_area) - np.nanmin(log_area) if np.isfinite(log_area).any() else 0
+        area_score = (log_area - np.nanmin(log_area)) / spread if spread > 0 else np.where(np.isfinite(log_area), 1.0, 0.0)
+        area_score = np.where(np.isfinite(area_score), area_score, 0.0)
+
+    approval_score = np.where(np.isfinite(approved), approved, 0.5)
+
+    centrality_score = np.full(n, 0.5)
+    if coordinates is not None:
+        coords = np.asarray(coordinates, dtype=float)
+        known = np.isfinite(coords).all(axis=1) & ~(coords == 0.0).all(axis=1)
+        if known.sum() > 1:
+            lat0, lon0 = coords[known].mean(axis=0)
+            # Equirectangular distance is accurate enough within a city
+            dy = coords[:, 0] - lat0
+            dx = (coords[:, 1] - lon0) * np.cos(np.radians(lat0))
+            distance = np.hypot(dx, dy)
+            max_distance = distance[known].max()
+            if max_distance > 0:
+                centrality_score = np.where(known, 1 - distance / max_distance, 0.5)
+
+    weight_vector = np.array([weights.price_value, weights.area, weights.approval, weights.centrality])
+    total = weight_vector.sum()
+    if total == 0:
+        return np.zeros(n)
+
+    scores = np.vstack([price_score, area_score, approval_score, centrality_score])
+    return weight_vector @ scores / total
+
+def rank_properties(
+    properties: List[PropertyData],
+    top_k: int = 5,
+    weights: Optional[RankingWeights] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    locality_medians: Optional[Dict[str, float]] = None,
+    coordinates: Optional[Sequence[Tuple[float, float]]] = None
+) -> List[PropertyData]:
+    """Return the ``top_k`` best plots, best first
+
+    Plots whose parsed price falls outside ``min_price``-``max_price``
+    (in crores) are dropped; plots with an unreadable price are kept.
+    """
+    if not properties:
+        return []
+
+    prices = _parse_prices(properties)
+    scores = _score(properties, prices, weights, locality_medians, coordinates)
+
+    prices = prices / CRORE
+    in_range = np.ones(len(properties), dtype=bool)
+    if min_price is not None:
+        in_range &= ~(prices < min_price)
+    if max_price is not None:
+        in_range &= ~(prices > max_price)
+
+    candidates = np.flatnonzero(in_range)
+    k = min(top_k, candidates.size)
+    if k == 0:
+        return []
+
+    # Partial selection keeps this linear in the number of candidates
+    candidate_scores = scores[candidates]
+    best = np.argpartition(-candidate_scores, k - 1)[:k]
+    best = best[np.argsort(-candidate_scores[best], kind="stable")]
+    return [properties[idx] for idx in candidates[best]]
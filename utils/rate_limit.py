@@ -0,0 +1,25 @@
+import threading
+import time
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls to an external API
+    
+    A single instance can be shared by many worker threads to enforce one
+    global request rate, however many cities are processed in parallel.
+    """
+    
+    def __init__(self, requests_per_second: float):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        """Block until the caller is allowed to make its next request"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        
+        # Sleep outside the lock so other threads can reserve later slots
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,228 @@
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from models.schemas import PropertyData
+from utils.price_utils import parse_price
+
+TEXT_DIMENSIONS = 64
+NUMERIC_DIMENSIONS = 4  # price, area, latitude, longitude
+
+# Feature scales: a difference of one unit is "noticeably different"
+PRICE_SCALE = 0.3  # log10 units, about 2x the price
+AREA_SCALE = 0.3  # log10 units, about 2x the area
+DISTANCE_SCALE_KM = 5.0
+KM_PER_DEGREE = 111.0
+
+STOPWORDS = {
+    "a", "an", "and", "the", "of", "in", "on", "for", "to", "with", "is", "at",
+    "by", "from", "this", "that", "it", "plot", "plots", "sq", "ft", "sqft",
+}
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def listing_key(prop: PropertyData) -> str:
+    """Stable identifier for a listing, its URL when available"""
+    return prop.url or f"{prop.building_name}|{prop.location_address}|{prop.price}"
+
+def embed_text(text: Optional[str], dimensions: int = TEXT_DIMENSIONS) -> np.ndarray:
+    """Hash unigrams and bigrams of the text into a unit-length vector
+
+    Signed feature hashing keeps the embedding local, deterministic and
+    cheap, with no vocabulary to fit. Returns zeros for empty text.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    tokens = [token for token in TOKEN_PATTERN.findall((text or "").lower()) if token not in STOPWORDS]
+    terms = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+    for term in terms:
+        digest = zlib.crc32(term.encode())
+        vector[digest % dimensions] += 1.0 if digest & 0x80000000 else -1.0
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+class PlotSimilarityIndex:
+    """In-memory k-NN index over listings for "more plots like this"
+
+    Each listing becomes a vector of scaled numeric features (log price,
+    log area, position in km) followed by a hashed embedding of its
+    description. Missing values are masked: a feature only counts when
+    both listings have it, and a fixed penalty applies when only one does.
+    Feature scaling is fixed rather than fitted, so inserts never require
+    re-indexing. Storage grows by doubling, and a query is one
+    matrix-vector product over the stored rows.
+    """
+
+    def __init__(self, text_weight: float = 1.0, missing_penalty: float = 1.0, initial_capacity: int = 1024):
+        self.text_weight = text_weight
+        self.dimensions = NUMERIC_DIMENSIONS + TEXT_DIMENSIONS
+        # Missing-value penalties: location and the description count as one feature each
+        self._penalty_weights = np.array([1.0, 1.0, 0.5, 0.5], dtype=np.float32) * missing_penalty
+        self._text_penalty = missing_penalty
+        # Positions are stored relative to the first geocoded listing to keep float32 precision
+        self._origin: Optional[Tuple[float, float]] = None
+        # Rows store [x^2, x, mask] of the numeric features, then the text
+        # embedding and a has-text flag, so a query is one matrix-vector product
+        self._features = np.zeros((initial_capacity, 3 * NUMERIC_DIMENSIONS + TEXT_DIMENSIONS + 1), dtype=np.float32)
+        self._row_penalties = np.zeros(initial_capacity, dtype=np.float32)
+        self._records: List[PropertyData] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def _vectorize(self, prop: PropertyData, latitude: Optional[float], longitude: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Caller must hold the lock, the first position sets the origin"""
+        values = np.zeros(self.dimensions, dtype=np.float32)
+        mask = np.zeros(self.dimensions, dtype=np.float32)
+
+        price = parse_price(prop.price)
+        if price and price > 0:
+            values[0], mask[0] = np.log10(price) / PRICE_SCALE, 1.0
+        if prop.area_sqft and prop.area_sqft > 0:
+            values[1], mask[1] = np.log10(prop.area_sqft) / AREA_SCALE, 1.0
+        if latitude is not None and longitude is not None and (latitude != 0.0 or longitude != 0.0):
+            if self._origin is None:
+                self._origin = (latitude, longitude)
+            origin_lat, origin_lon = self._origin
+            values[2] = (latitude - origin_lat) * KM_PER_DEGREE / DISTANCE_SCALE_KM
+            values[3] = (longitude - origin_lon) * KM_PER_DEGREE * np.cos(np.radians(latitude)) / DISTANCE_SCALE_KM
+            mask[2:4] = 1.0
+
+        embedding = embed_text(prop.description)
+        if embedding.any():
+            values[NUMERIC_DIMENSIONS:] = embedding * np.sqrt(self.text_weight)
+            mask[NUMERIC_DIMENSIONS:] = 1.0
+
+        return values, mask
+
+    def _grow(self, needed: int):
+        capacity = self._features.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_features", "_row_penalties"):
+            current = getattr(self, name)
+            grown = np.zeros((capacity,) + current.shape[1:], dtype=np.float32)
+            grown[:len(self._records)] = current[:len(self._records)]
+            setattr(self, name, grown)
+
+    def add(self, prop: PropertyData, latitude: Optional[float] = None, longitude: Optional[float] = None) -> str:
+        """Insert or update a listing and return its key
+
+        Updating a listing without a usable position keeps the position
+        stored earlier, e.g. from a bulk crawl.
+        """
+        key = listing_key(prop)
+
+        with self._lock:
+            values, mask = self._vectorize(prop, latitude, longitude)
+            row = self._rows.get(key)
+            if row is None:
+                row = len(self._records)
+                self._grow(row + 1)
+                self._records.append(prop)
+                self._rows[key] = row
+            else:
+                self._records[row] = prop
+                if not mask[2]:
+                    stored_values, stored_mask = self._unpack(row)
+                    values[2:4], mask[2:4] = stored_values[2:4], stored_mask[2:4]
+            self._features[row] = self._row_features(values, mask)
+            self._row_penalties[row] = mask[:NUMERIC_DIMENSIONS] @ self._penalty_weights + self._text_penalty * mask[-1]
+
+        return key
+
+    def add_many(
+        self,
+        properties: Sequence[PropertyData],
+        coordinates: Optional[Sequence[Tuple[float, float]]] = None
+    ) -> List[str]:
+        """Insert a batch of listings, optionally with their coordinates"""
+        if coordinates is None:
+            coordinates = [(None, None)] * len(properties)
+        return [self.add(prop, lat, lon) for prop, (lat, lon) in zip(properties, coordinates)]
+
+    def _row_features(self, values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        numeric, numeric_mask = values[:NUMERIC_DIMENSIONS], mask[:NUMERIC_DIMENSIONS]
+        return np.concatenate([numeric * numeric, numeric, numeric_mask, values[NUMERIC_DIMENSIONS:], mask[-1:]])
+
+    def _unpack(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Recover the values and mask of a stored row"""
+        n = NUMERIC_DIMENSIONS
+        features = self._features[row]
+        values = np.concatenate([features[n:2 * n], features[3 * n:-1]])
+        mask = np.concatenate([features[2 * n:3 * n], np.full(TEXT_DIMENSIONS, features[-1], dtype=np.float32)])
+        return values, mask
+
+    def _search(self, values: np.ndarray, mask: np.ndarray, k: int, exclude_row: Optional[int]) -> List[Tuple[PropertyData, float]]:
+        """Caller must hold the lock"""
+        n = len(self._records)
+        if n == 0:
+            return []
+        # Masked squared distance: the sum over shared features of (x - q)^2,
+        # plus a penalty for every feature present on only one side. Expanded,
+        # every term is linear in the stored columns. Text embeddings have a
+        # fixed norm, so their squared terms reduce to the has-text flag.
+        numeric, numeric_mask = values[:NUMERIC_DIMENSIONS], mask[:NUMERIC_DIMENSIONS]
+        has_text = mask[-1]
+        query = np.concatenate([
+            numeric_mask,
+            -2 * numeric * numeric_mask,
+            numeric * numeric - 2 * numeric_mask * self._penalty_weights,
+            -2 * values[NUMERIC_DIMENSIONS:],
+            [has_text * (2 * self.text_weight - 2 * self._text_penalty)]
+        ]).astype(np.float32)
+        query_penalty = numeric_mask @ self._penalty_weights + self._text_penalty * has_text
+        distances = self._features[:n] @ query + self._row_penalties[:n] + query_penalty
+        if exclude_row is not None:
+            distances[exclude_row] = np.inf
+
+        k = min(k, n - (exclude_row is not None))
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(self._records[row], float(np.sqrt(max(distances[row], 0.0)))) for row in nearest]
+
+    def query(
+        self,
+        prop: PropertyData,
+        k: int = 5,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ) -> List[Tuple[PropertyData, float]]:
+        """Nearest stored listings to an arbitrary listing, closest first"""
+        with self._lock:
+            values, mask = self._vectorize(prop, latitude, longitude)
+            return self._search(values, mask, k, self._rows.get(listing_key(prop)))
+
+    def find(self, text: str, limit: int = 50) -> List[Tuple[str, PropertyData]]:
+        """Stored listings whose name or address contains ``text``, as (key, listing)"""
+        needle = text.strip().lower()
+        with self._lock:
+            items = list(self._rows.items())
+            records = list(self._records)
+        matches = []
+        for key, row in items:
+            prop = records[row]
+            if needle in f"{prop.building_name} {prop.location_address}".lower():
+                matches.append((key, prop))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def neighbours(self, key: str, k: int = 5) -> List[Tuple[PropertyData, float]]:
+        """Nearest listings to a stored listing, excluding itself"""
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return []
+            values, mask = self._unpack(row)
+            return self._search(values, mask, k, row)
@@ -0,0 +1,163 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Sequence
+import numpy as np
+from models.schemas import PriceGridCell, PropertyLocation
+
+# Cell width in degrees for each map zoom level
+ZOOM_CELL_SIZES = {
+    10: 0.04,
+    12: 0.01,
+    14: 0.0025,
+}
+
+SQRT3 = np.sqrt(3.0)
+
+# Precomputed grids keyed by a fingerprint of the input listings
+_GRID_CACHE: "OrderedDict[str, Dict[int, List[PriceGridCell]]]" = OrderedDict()
+GRID_CACHE_SIZE = 32
+# Streamlit sessions run in separate threads but share this module
+_GRID_CACHE_LOCK = threading.Lock()
+
+def _square_cells(x: np.ndarray, y: np.ndarray, size: float):
+    """Assign points to square cells and return cell indices and centres"""
+    ix = np.floor(x / size).astype(np.int64)
+    iy = np.floor(y / size).astype(np.int64)
+    return ix, iy, (ix + 0.5) * size, (iy + 0.5) * size
+
+def _hex_cells(x: np.ndarray, y: np.ndarray, size: float):
+    """Assign points to pointy-top hexagons of circumradius ``size``"""
+    q = (SQRT3 / 3 * x - y / 3) / size
+    r = (2.0 / 3 * y) / size
+    s = -q - r
+
+    # Round cube coordinates, fixing the component with the largest error
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+
+    iq, ir = rq.astype(np.int64), rr.astype(np.int64)
+    cx = size * SQRT3 * (iq + ir / 2.0)
+    cy = size * 1.5 * ir
+    return iq, ir, cx, cy
+
+def _cell_boundary(cx: float, cy: float, size: float, shape: str, lon_scale: float) -> List[List[float]]:
+    """Polygon of a cell as [lon, lat] pairs, closed for GeoJSON"""
+    if shape == "hex":
+        angles = np.radians(30 + 60 * np.arange(6))
+        xs, ys = cx + size * np.cos(angles), cy + size * np.sin(angles)
+    else:
+        half = size / 2
+        xs = np.array([cx - half, cx + half, cx + half, cx - half])
+        ys = np.array([cy - half, cy - half, cy + half, cy + half])
+
+    # Five decimals is about a metre, plenty for drawing and much smaller to embed
+    points = [[round(float(px / lon_scale), 5), round(float(py), 5)] for px, py in zip(xs, ys)]
+    return points + [points[0]]
+
+def aggregate_prices(
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    prices_per_sqft: Sequence[float],
+    cell_size: float,
+    shape: str = "hex",
+    zoom: int = 12
+) -> List[PriceGridCell]:
+    """Bin listings into grid cells and compute the median price per sq ft
+
+    Binning and the per-cell medians are vectorised with numpy, so the
+    cost is dominated by a single sort of the listings. Longitudes are
+    scaled by the cosine of the mean latitude so cells keep roughly the
+    same ground size in both directions.
+    """
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    values = np.asarray(prices_per_sqft, dtype=float)
+
+    valid = np.isfinite(lat) & np.isfinite(lon) & np.isfinite(values) & ~((lat == 0.0) & (lon == 0.0))
+    lat, lon, values = lat[valid], lon[valid], values[valid]
+    if values.size == 0:
+        return []
+
+    lon_scale = float(np.cos(np.radians(lat.mean())))
+    x = lon * lon_scale
+
+    if shape == "hex":
+        size = cell_size / SQRT3  # circumradius giving a cell width of cell_size
+        ia, ib, cx, cy = _hex_cells(x, lat, size)
+    else:
+        size = cell_size
+        ia, ib, cx, cy = _square_cells(x, lat, size)
+
+    keys = (ia << 32) + ib
+    unique_keys, first_idx, inverse, counts = np.unique(
+        keys, return_index=True, return_inverse=True, return_counts=True
+    )
+
+    # Sort by cell then value so each cell's values are contiguous and ordered
+    order = np.lexsort((values, inverse))
+    sorted_values = values[order]
+    starts = np.cumsum(counts) - counts
+    upper = sorted_values[starts + counts // 2]
+    lower = sorted_values[starts + (counts - 1) // 2]
+    medians = (upper + lower) / 2
+
+    return [
+        PriceGridCell(
+            zoom=zoom,
+            cell_id=f"{shape}:{zoom}:{ia[idx]}:{ib[idx]}",
+            latitude=float(cy[idx]),
+            longitude=float(cx[idx] / lon_scale),
+            boundary=_cell_boundary(cx[idx], cy[idx], size, shape, lon_scale),
+            median_price_per_sqft=float(median),
+            count=int(count)
+        )
+        for idx, median, count in zip(first_idx, medians, counts)
+    ]
+
+def _fingerprint(lat: np.ndarray, lon: np.ndarray, values: np.ndarray, shape: str, zoom_levels: Sequence[int]) -> str:
+    digest = hashlib.sha1()
+    for array in (lat, lon, values):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(f"{shape}:{sorted(zoom_levels)}".encode())
+    return digest.hexdigest()
+
+def precompute_price_grids(
+    property_locations: List[PropertyLocation],
+    zoom_levels: Sequence[int] = tuple(ZOOM_CELL_SIZES),
+    shape: str = "hex"
+) -> Dict[int, List[PriceGridCell]]:
+    """Aggregate listings at several zoom levels, reusing cached results
+
+    Listings without price per sq ft or without coordinates, including
+    addresses the geocoder could not place, are ignored. Results are
+    cached by the content of the listings, so redrawing the map for the
+    same data does not redo the aggregation.
+    """
+    priced = [loc for loc in property_locations if loc.price_per_sqft is not None]
+    lat = np.array([loc.latitude for loc in priced], dtype=float)
+    lon = np.array([loc.longitude for loc in priced], dtype=float)
+    values = np.array([loc.price_per_sqft for loc in priced], dtype=float)
+
+    key = _fingerprint(lat, lon, values, shape, zoom_levels)
+    with _GRID_CACHE_LOCK:
+        if key in _GRID_CACHE:
+            _GRID_CACHE.move_to_end(key)
+            return _GRID_CACHE[key]
+
+    # Aggregate outside the lock so other sessions are not held up
+    grids = {
+        zoom: aggregate_prices(lat, lon, values, ZOOM_CELL_SIZES[zoom], shape=shape, zoom=zoom)
+        for zoom in zoom_levels
+    }
+
+    with _GRID_CACHE_LOCK:
+        _GRID_CACHE[key] = grids
+        if len(_GRID_CACHE) > GRID_CACHE_SIZE:
+            _GRID_CACHE.popitem(last=False)
+
+    return grids